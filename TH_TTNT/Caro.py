@@ -1,56 +1,353 @@
+import argparse
+import collections
+import json
+import math
+import multiprocessing
+import os
+import platform
+import queue
+import random
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_EXCEPTION, ProcessPoolExecutor, wait
 import tkinter as tk
 from tkinter import messagebox
 
+try:
+    import numpy as np
+except ImportError:   #numpy là tùy chọn, chỉ cần cho BatchEvaluator
+    np = None
+
 #HẰNG SỐ QUY ƯỚC
 EMPTY = 0
 HUMAN = 1   #X
 AI = -1     #O
 INF = 10**9
+WIN_SCORE = 10**7   #lớn hơn mọi điểm mẫu có thể có
+
+#Các kích thước bàn trong giao diện; bàn từ SPARSE_BOARD_MIN_SIZE trở lên dùng SparseBoard
+BOARD_SIZES = (3, 5, 10, 15, 19)
+SPARSE_BOARD_MIN_SIZE = 15
+
+#Thời gian suy nghĩ mặc định của AI trong giao diện (giây/nước)
+AI_TIME_LIMIT = 1.0
+#Số tiến trình tìm song song ở gốc (1 = tìm tuần tự)
+AI_WORKERS = 1
+#Thời gian tối đa AI suy nghĩ trước (ponder) trong lượt của người (giây)
+PONDER_TIME_LIMIT = 30.0
+#Thời gian đoán nước đi của người trước khi ponder (giây)
+PREDICT_TIME_LIMIT = 0.2
+
+#4 hướng kiểm tra chuỗi quân
+DIRECTIONS = (
+    (1, 0),   #dọc
+    (0, 1),   #ngang
+    (1, 1),   #chéo xuống phải
+    (1, -1),  #chéo xuống trái
+)
+
+#Nửa độ rộng cửa sổ aspiration quanh điểm của vòng sâu dần trước (bằng điểm 1 cửa sổ 4 quân).
+#Cửa sổ hẹp hơn (30-300) bị vượt thường xuyên, tìm lại tốn hơn phần tiết kiệm được
+ASPIRATION_WINDOW = 1000
+
+#Loại giá trị lưu trong bảng chuyển vị
+EXACT = 0   #giá trị chính xác
+LOWER = 1   #cận dưới (bị cắt beta)
+UPPER = 2   #cận trên (không vượt được alpha)
+
+#Khóa Zobrist dùng chung cho mọi bàn cùng kích thước (seed cố định để kết quả lặp lại được)
+_ZOBRIST_CACHE = {}
+
+
+def zobrist_keys(size: int):
+    """
+    Trả về (keys, side_key):
+    - keys[player][row][col]: số ngẫu nhiên 64 bit cho quân player tại ô (row, col)
+    - side_key: XOR thêm vào khi đến lượt AI để phân biệt bên đi
+    """
+    if size not in _ZOBRIST_CACHE:
+        rng = random.Random(size)
+        keys = {
+            player: [[rng.getrandbits(64) for _ in range(size)] for _ in range(size)]
+            for player in (HUMAN, AI)
+        }
+        _ZOBRIST_CACHE[size] = (keys, rng.getrandbits(64))
+    return _ZOBRIST_CACHE[size]
+
 
 #CLASS BÀN CỜ
 class Board:
-    def __init__(self, size: int, win_length: int):
+    def __init__(self, size: int, win_length: int, candidate_radius: int | None = 2):
         """
         size: kích thước bàn cờ (3, 5, 10)
         win_length: số quân liên tiếp để thắng (3 hoặc 5)
+        candidate_radius: generate_moves chỉ trả các ô trống cách quân gần nhất <= k ô
+                          (None = trả mọi ô trống)
         """
         self.size = size
         self.win_length = win_length
-        self.grid = [[EMPTY for _ in range(size)] for _ in range(size)]
+        self.candidate_radius = candidate_radius
+        self.zobrist, self.side_key = zobrist_keys(size)
+        #neighborhood[(row, col)]: các ô trong bán kính candidate_radius quanh ô đó
+        self.neighborhood = {}
+        if candidate_radius is not None:
+            k = candidate_radius
+            for row in range(size):
+                for col in range(size):
+                    self.neighborhood[(row, col)] = [
+                        (r, c)
+                        for r in range(max(0, row - k), min(size, row + k + 1))
+                        for c in range(max(0, col - k), min(size, col + k + 1))
+                        if (r, c) != (row, col)
+                    ]
+        #Các "cửa sổ": mọi đoạn win_length ô liên tiếp theo 4 hướng
+        #cell_windows[(row, col)]: chỉ số các cửa sổ chứa ô đó
+        self.windows = []
+        self.cell_windows = {(row, col): [] for row in range(size) for col in range(size)}
+        for row in range(size):
+            for col in range(size):
+                for d_row, d_col in DIRECTIONS:
+                    end_row = row + (win_length - 1) * d_row
+                    end_col = col + (win_length - 1) * d_col
+                    if not self.in_bounds(end_row, end_col):
+                        continue
+                    cells = [(row + i * d_row, col + i * d_col) for i in range(win_length)]
+                    for cell in cells:
+                        self.cell_windows[cell].append(len(self.windows))
+                    self.windows.append(cells)
+        #window_value[h][a]: điểm (theo phía HUMAN) của cửa sổ có h quân X và a quân O
+        #Cửa sổ có quân của cả 2 bên thì không còn giá trị
+        weights = [0] + [10 ** (n - 1) for n in range(1, win_length + 1)]
+        self.window_value = [
+            [weights[h] if a == 0 else (-weights[a] if h == 0 else 0) for a in range(win_length + 1)]
+            for h in range(win_length + 1)
+        ]
+        self._clear_cells()
+        #Lịch sử nước đi: (row, col, winner trước nước đó) để hoàn tác đúng
+        self.history = []
+        #True sau khi gỡ quân không theo thứ tự: winner lưu trong lịch sử có thể đã sai
+        self.history_dirty = False
+        self.last_move = None
+        self.winner = None
+        self.stone_count = 0
+        #Khóa Zobrist của thế cờ, cập nhật dần khi đánh/hoàn tác
+        self.hash = 0
+        #near_count[ô]: số quân trong bán kính k quanh ô; candidates: các ô trống có near_count > 0
+        self.near_count = {}
+        self.candidates = {}
+        #Số quân mỗi bên trong từng cửa sổ và tổng điểm mẫu (theo phía HUMAN)
+        self.window_count = {HUMAN: [0] * len(self.windows), AI: [0] * len(self.windows)}
+        self.pattern_score = 0
+        #threat_windows[player][n]: các cửa sổ chỉ có đúng n quân của player (n >= threat_min)
+        self.threat_min = max(1, win_length - 3)
+        self._reset_threat_windows()
+
+    def _reset_threat_windows(self):
+        self.threat_windows = {
+            player: {n: set() for n in range(self.threat_min, self.win_length + 1)}
+            for player in (HUMAN, AI)
+        }
 
     def reset(self):
         #Xóa bàn cờ, tạo lại ô trống
+        self._clear_cells()
+        self.history = []
+        self.history_dirty = False
+        self.last_move = None
+        self.winner = None
+        self.stone_count = 0
+        self.hash = 0
+        self.near_count = {}
+        self.candidates = {}
+        self.window_count = {HUMAN: [0] * len(self.windows), AI: [0] * len(self.windows)}
+        self.pattern_score = 0
+        self._reset_threat_windows()
+
+    def _clear_cells(self):
+        #Tạo lưới toàn ô trống - lớp con ghi đè để đổi cách lưu trữ
         self.grid = [[EMPTY for _ in range(self.size)] for _ in range(self.size)]
 
     def in_bounds(self, row: int, col: int) -> bool:
         #Kiểm tra ô (row, col) có nằm trong bàn cờ không
         return 0 <= row < self.size and 0 <= col < self.size
 
+    def get_cell(self, row: int, col: int) -> int:
+        #Lấy giá trị ô (row, col): EMPTY, HUMAN hoặc AI
+        return self.grid[row][col]
+
+    def _set_cell(self, row: int, col: int, value: int):
+        #Ghi giá trị vào ô - lớp con (SparseBoard) ghi đè để đổi cách lưu trữ
+        self.grid[row][col] = value
+
     def place_move(self, row: int, col: int, player: int):
         #Đặt quân lên bàn cờ nếu ô trống
-        if self.grid[row][col] == EMPTY:
-            self.grid[row][col] = player
+        if self.get_cell(row, col) != EMPTY:
+            return
+        self._set_cell(row, col, player)
+        self.stone_count += 1
+        self.hash ^= self.zobrist[player][row][col]
+        if self.candidate_radius is not None:
+            self._add_near(row, col)
+        self._update_windows(row, col, player, 1)
+        self.history.append((row, col, self.winner))
+        self.last_move = (row, col)
+        #Chỉ cần xét các đường đi qua ô vừa đánh
+        if self.winner is None and self.is_winning_move(row, col):
+            self.winner = player
 
     def remove_move(self, row: int, col: int):
         #Hoàn tác nước đi (dùng trong Minimax)
-        self.grid[row][col] = EMPTY
+        player = self.get_cell(row, col)
+        if player == EMPTY:
+            return
+        self._set_cell(row, col, EMPTY)
+        self.stone_count -= 1
+        self.hash ^= self.zobrist[player][row][col]
+        if self.candidate_radius is not None:
+            self._remove_near(row, col)
+        self._update_windows(row, col, player, -1)
+        if self.history and self.history[-1][:2] == (row, col):
+            previous = self.history.pop()[2]
+            self.winner = self._scan_winner() if self.history_dirty else previous
+        else:
+            #Gỡ quân không theo thứ tự đánh -> bỏ khỏi lịch sử và quét lại toàn bàn;
+            #các winner đã lưu không còn đúng nên những lần hoàn tác sau cũng phải quét lại
+            self.history = [h for h in self.history if h[:2] != (row, col)]
+            self.history_dirty = True
+            self.winner = self._scan_winner()
+        if not self.history:
+            self.history_dirty = False
+        self.last_move = self.history[-1][:2] if self.history else None
+
+    def _add_near(self, row: int, col: int):
+        #Cập nhật tập ứng viên khi đặt quân: O(k^2), không quét cả bàn
+        near_count = self.near_count
+        candidates = self.candidates
+        candidates.pop((row, col), None)
+        for cell in self.neighborhood[(row, col)]:
+            count = near_count.get(cell, 0) + 1
+            near_count[cell] = count
+            if count == 1 and self.get_cell(*cell) == EMPTY:
+                candidates[cell] = True
+
+    def _remove_near(self, row: int, col: int):
+        #Cập nhật tập ứng viên khi gỡ quân
+        near_count = self.near_count
+        candidates = self.candidates
+        for cell in self.neighborhood[(row, col)]:
+            count = near_count[cell] - 1
+            if count:
+                near_count[cell] = count
+            else:
+                del near_count[cell]
+                candidates.pop(cell, None)
+        if near_count.get((row, col)):
+            candidates[(row, col)] = True
+
+    def _update_windows(self, row: int, col: int, player: int, delta: int):
+        #Cập nhật số quân trong các cửa sổ chứa ô (row, col) và điểm mẫu: O(4 * win_length)
+        humans = self.window_count[HUMAN]
+        ais = self.window_count[AI]
+        counts = self.window_count[player]
+        value = self.window_value
+        score = self.pattern_score
+        low = self.threat_min
+        human_sets = self.threat_windows[HUMAN]
+        ai_sets = self.threat_windows[AI]
+        for w in self.cell_windows[(row, col)]:
+            h = humans[w]
+            a = ais[w]
+            score -= value[h][a]
+            if a == 0 and h >= low:
+                human_sets[h].discard(w)
+            elif h == 0 and a >= low:
+                ai_sets[a].discard(w)
+            counts[w] += delta
+            h = humans[w]
+            a = ais[w]
+            score += value[h][a]
+            if a == 0 and h >= low:
+                human_sets[h].add(w)
+            elif h == 0 and a >= low:
+                ai_sets[a].add(w)
+        self.pattern_score = score
+
+    def window_cells(self, player: int, count: int):
+        #Các ô trống thuộc cửa sổ chỉ có đúng count quân của player (count >= threat_min)
+        cells = set()
+        windows = self.windows
+        for w in self.threat_windows[player][count]:
+            for cell in windows[w]:
+                if self.get_cell(*cell) == EMPTY:
+                    cells.add(cell)
+        return cells
+
+    def winning_cells(self, player: int):
+        #Các ô mà player đánh vào là thắng ngay
+        return self.window_cells(player, self.win_length - 1)
+
+    def pattern_score_for(self, player: int) -> int:
+        """
+        Điểm mẫu của thế cờ theo phía player, O(1).
+        Mỗi cửa sổ chỉ chứa quân 1 bên với n quân được 10^(n-1) điểm cho bên đó,
+        nên đường 2/3/4 "mở" (nằm trong nhiều cửa sổ chưa bị chặn) được điểm cao hơn đường bị chặn.
+        """
+        return self.pattern_score if player == HUMAN else -self.pattern_score
+
+    def moves_played(self):
+        #Danh sách (row, col, player) theo thứ tự đã đánh
+        return [(row, col, self.get_cell(row, col)) for row, col, _ in self.history]
+
+    def copy(self):
+        #Tạo bàn cờ mới cùng loại và đánh lại toàn bộ lịch sử (mọi thông tin cập nhật dần đều đúng)
+        board = type(self)(self.size, self.win_length, self.candidate_radius)
+        for row, col, player in self.moves_played():
+            board.place_move(row, col, player)
+        return board
+
+    def undo_move(self):
+        #Hoàn tác nước đi cuối cùng trong lịch sử
+        if self.history:
+            row, col, _ = self.history[-1]
+            self.remove_move(row, col)
+
+    def line_length(self, row: int, col: int, d_row: int, d_col: int) -> int:
+        #Độ dài chuỗi quân liên tiếp cùng màu đi qua ô (row, col) theo hướng (d_row, d_col)
+        player = self.get_cell(row, col)
+        if player == EMPTY:
+            return 0
+        count = 1
+        for sign in (1, -1):
+            r = row + sign * d_row
+            c = col + sign * d_col
+            while self.in_bounds(r, c) and self.get_cell(r, c) == player and count < self.win_length:
+                count += 1
+                r += sign * d_row
+                c += sign * d_col
+        return count
+
+    def is_winning_move(self, row: int, col: int) -> bool:
+        #Nước ở ô (row, col) có tạo thành chuỗi win_length không - O(win_length)
+        for d_row, d_col in DIRECTIONS:
+            if self.line_length(row, col, d_row, d_col) >= self.win_length:
+                return True
+        return False
 
     def check_winner(self):
         #Kiểm tra xem có ai thắng chưa.
         #Trả về:HUMAN (1) nếu người thắng, AI (-1) nếu AI thắng, None nếu chưa có ai thắng
-        directions = [
-            (1, 0),   #dọc
-            (0, 1),   #ngang
-            (1, 1),   #chéo xuống phải
-            (1, -1),  #chéo xuống trái
-        ]
+        #Kết quả được cập nhật dần trong place_move/remove_move nên chỉ tốn O(1)
+        return self.winner
 
+    def _scan_winner(self):
+        #Quét toàn bộ bàn cờ để tìm người thắng (chỉ dùng khi không hoàn tác theo thứ tự)
         for row in range(self.size):
             for col in range(self.size):
                 if self.grid[row][col] == EMPTY:
                     continue
                 player = self.grid[row][col]
-                for d_row, d_col in directions:
+                for d_row, d_col in DIRECTIONS:
                     count = 1
                     r = row + d_row
                     c = col + d_col
@@ -64,7 +361,7 @@ class Board:
 
     def is_full(self) -> bool:
         #Kiểm tra bàn cờ đã đầy chưa
-        return all(cell != EMPTY for row in self.grid for cell in row)
+        return self.stone_count == self.size * self.size
 
     def game_over(self) -> bool:
         #Trả về True nếu game kết thúc
@@ -75,6 +372,19 @@ class Board:
         return False
 
     def generate_moves(self):
+        """
+        Các nước đáng xét cho AI:
+        - Bàn trống hoặc tắt candidate_radius -> mọi ô trống
+        - Ngược lại -> các ô trống gần quân đã đánh, theo thứ tự hàng -> cột
+        """
+        if self.candidate_radius is None or self.stone_count == 0:
+            return self.empty_cells()
+        if self.candidates:
+            return sorted(self.candidates)
+        #Mọi ô gần quân đều đã kín nhưng vẫn còn ô trống ở xa
+        return self.empty_cells()
+
+    def empty_cells(self):
         #Liệt kê tất cả các ô trống có thể đánh
         moves = []
         for row in range(self.size):
@@ -90,72 +400,971 @@ class Board:
         return self.win_length
 
 
+#CLASS BÀN CỜ THƯA (BÀN LỚN)
+class SparseBoard(Board):
+    """
+    Bàn cờ chỉ lưu các ô đã có quân: cells[(row, col)] = player.
+    - Đọc/ghi ô, kiểm tra đầy, quét người thắng chỉ phụ thuộc số quân đã đánh,
+      không phụ thuộc diện tích bàn -> dùng cho bàn lớn (15x15, 19x19, ...)
+    - Bàn trống: chỉ sinh nước ở tâm bàn thay vì mọi ô trống
+    Giao diện giống Board nên AIPlayer/MCTSPlayer dùng được mà không cần sửa.
+    """
+
+    @property
+    def grid(self):
+        #Dựng lại lưới 2 chiều (chỉ để tương thích, không dùng trong tìm kiếm)
+        return [[self.cells.get((row, col), EMPTY) for col in range(self.size)] for row in range(self.size)]
+
+    def _clear_cells(self):
+        self.cells = {}
+
+    def get_cell(self, row: int, col: int) -> int:
+        return self.cells.get((row, col), EMPTY)
+
+    def _set_cell(self, row: int, col: int, value: int):
+        if value == EMPTY:
+            self.cells.pop((row, col), None)
+        else:
+            self.cells[(row, col)] = value
+
+    def _scan_winner(self):
+        #Chỉ xét các ô có quân
+        for (row, col), player in self.cells.items():
+            if self.is_winning_move(row, col):
+                return player
+        return None
+
+    def generate_moves(self):
+        if self.stone_count == 0:
+            center = self.size // 2
+            return [(center, center)]
+        return super().generate_moves()
+
+    def empty_cells(self):
+        cells = self.cells
+        return [(row, col) for row in range(self.size) for col in range(self.size) if (row, col) not in cells]
+
+
+def new_board(size: int, win_length: int, candidate_radius: int | None = 2) -> Board:
+    #Chọn cách lưu bàn cờ theo kích thước: lưới list cho bàn nhỏ, bàn thưa cho bàn lớn
+    if size >= SPARSE_BOARD_MIN_SIZE:
+        return SparseBoard(size, win_length, candidate_radius)
+    return Board(size, win_length, candidate_radius)
+
+
+#CLASS CHẤM ĐIỂM HÀNG LOẠT (NUMPY)
+class BatchEvaluator:
+    """
+    Chấm điểm mẫu cho nhiều thế cờ cùng lúc bằng NumPy (cùng cách tính với Board.pattern_score):
+    - states: mảng (B, size, size) các giá trị EMPTY/HUMAN/AI
+    - Mỗi ô mã hóa thành HUMAN -> win_length + 1, AI -> 1; tổng mã của win_length ô liên tiếp
+      (cộng các lát cắt dịch chuyển theo 4 hướng, như tích chập với nhân toàn 1)
+      = h * (win_length + 1) + a, tra bảng ra điểm của cửa sổ
+    Dùng để chấm mọi nước con của 1 nút cùng lúc thay vì đánh/hoàn tác từng nước.
+    """
+
+    def __init__(self, size: int, win_length: int):
+        if np is None:
+            raise ImportError("BatchEvaluator cần numpy (pip install numpy)")
+        self.size = size
+        self.win_length = win_length
+        base = win_length + 1
+        weights = [0] + [10 ** (n - 1) for n in range(1, win_length + 1)]
+        #table[h * base + a]: điểm (theo phía HUMAN) của cửa sổ có h quân X và a quân O
+        table = np.zeros(base * base, dtype=np.int64)
+        for h in range(base):
+            for a in range(base):
+                if a == 0:
+                    table[h * base + a] = weights[h]
+                elif h == 0:
+                    table[h * base + a] = -weights[a]
+        self.table = table
+        self.human_win = win_length * base
+        self.ai_win = win_length
+        self.code = np.zeros(3, dtype=np.int16)
+        self.code[HUMAN] = base
+        self.code[AI] = 1
+        #slices[d]: win_length lát cắt (hàng, cột), lát thứ k là ô thứ k của mọi cửa sổ theo hướng d
+        self.slices = []
+        span = win_length - 1
+        for d_row, d_col in DIRECTIONS:
+            rows = size - span * d_row
+            cols = size - span * abs(d_col)
+            if rows <= 0 or cols <= 0:
+                continue
+            first_col = span if d_col < 0 else 0
+            self.slices.append([
+                (slice(k * d_row, k * d_row + rows), slice(first_col + k * d_col, first_col + k * d_col + cols))
+                for k in range(win_length)
+            ])
+
+    def encode(self, boards) -> "np.ndarray":
+        #Chuyển danh sách Board thành mảng (B, size, size)
+        return np.array([board.grid for board in boards], dtype=np.int8)
+
+    def children(self, board: Board, moves, player: int) -> "np.ndarray":
+        #Mảng các thế cờ con: mỗi phần tử là board sau khi player đánh 1 nước trong moves
+        states = np.repeat(self.encode([board]), len(moves), axis=0)
+        rows, cols = zip(*moves)
+        states[np.arange(len(moves)), rows, cols] = player
+        return states
+
+    def scores(self, states: "np.ndarray"):
+        """
+        Trả về (điểm mẫu theo phía HUMAN, người thắng) của từng thế cờ.
+        Người thắng: HUMAN/AI nếu có cửa sổ đủ win_length quân, 0 nếu chưa ai thắng.
+        """
+        codes = self.code[states]
+        total = np.zeros(len(states), dtype=np.int64)
+        winner = np.zeros(len(states), dtype=np.int8)
+        for cells in self.slices:
+            rows, cols = cells[0]
+            windows = codes[:, rows, cols].copy()
+            for rows, cols in cells[1:]:
+                windows += codes[:, rows, cols]
+            total += self.table[windows].sum(axis=(1, 2))
+            winner[(windows == self.human_win).any(axis=(1, 2))] = HUMAN
+            winner[(windows == self.ai_win).any(axis=(1, 2))] = AI
+        return total, winner
+
+    def evaluate(self, states: "np.ndarray", player: int = AI) -> "np.ndarray":
+        #Giống AIPlayer.evaluate cho từng thế cờ, theo phía player
+        total, winner = self.scores(states)
+        values = total if player == HUMAN else -total
+        values[winner == player] = WIN_SCORE
+        values[winner == -player] = -WIN_SCORE
+        return values
+
+
+#CLASS BẢNG CHUYỂN VỊ
+class TranspositionTable:
+    """
+    Bảng chuyển vị có giới hạn kích thước, đánh chỉ số theo khóa Zobrist.
+    Mỗi ô lưu: (key, depth, value, flag, best_move, generation)
+    policy:
+    - "depth": chỉ ghi đè khi độ sâu mới >= độ sâu cũ hoặc ô cũ thuộc lượt tìm kiếm trước
+    - "always": luôn ghi đè
+    """
+
+    def __init__(self, size: int = 1 << 16, policy: str = "depth"):
+        if size <= 0:
+            raise ValueError("Kích thước bảng chuyển vị phải > 0.")
+        if policy not in ("depth", "always"):
+            raise ValueError(f"Chính sách thay thế không hợp lệ: {policy}")
+        self.size = size
+        self.policy = policy
+        self.slots = [None] * size
+        self.generation = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        #Bộ đếm cho 1 lượt tìm kiếm
+        self.probes = 0
+        self.hits = 0
+        self.cutoffs = 0
+        self.stores = 0
+        self.overwrites = 0
+
+    def new_search(self):
+        #Bắt đầu lượt tìm kiếm mới: tăng thế hệ để ô cũ dễ bị thay, xóa bộ đếm
+        self.generation += 1
+        self.reset_stats()
+
+    def clear(self):
+        self.slots = [None] * self.size
+        self.reset_stats()
+
+    def probe(self, key: int):
+        #Tra bảng, trả về entry nếu khớp khóa, ngược lại None
+        self.probes += 1
+        entry = self.slots[key % self.size]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        return None
+
+    def store(self, key: int, depth: int, value: int, flag: int, best_move):
+        index = key % self.size
+        old = self.slots[index]
+        if old is not None:
+            if (self.policy == "depth" and old[0] != key
+                    and old[5] == self.generation and old[1] > depth):
+                return
+            self.overwrites += 1
+        self.slots[index] = (key, depth, value, flag, best_move, self.generation)
+        self.stores += 1
+
+    def stats(self) -> dict:
+        #Tỉ lệ trúng bảng và tỉ lệ cắt nhánh nhờ bảng trong lượt tìm kiếm gần nhất
+        return {
+            "probes": self.probes,
+            "hits": self.hits,
+            "cutoffs": self.cutoffs,
+            "stores": self.stores,
+            "overwrites": self.overwrites,
+            "hit_rate": self.hits / self.probes if self.probes else 0.0,
+            "cutoff_rate": self.cutoffs / self.probes if self.probes else 0.0,
+        }
+
+
+class SearchTimeout(Exception):
+    #Hết thời gian tìm kiếm - dùng để thoát khỏi đệ quy Minimax
+    pass
+
+
+#CLASS THEO DÕI TÌM KIẾM
+class SearchStats:
+    """
+    Số liệu chi tiết của 1 lượt tìm kiếm, chỉ được ghi khi AIPlayer.trace khác None
+    (tắt thì Minimax chỉ tốn thêm 1 phép so sánh với None mỗi nút):
+    - nodes, leaf_evals: số nút Minimax đã thăm / số lần gọi hàm đánh giá ở lá
+    - cutoffs_by_index[i]: số lần cắt beta xảy ra ở nước thứ i (0 = nước đầu tiên)
+    - check_winner_calls, check_winner_time: số lần gọi Board.check_winner và tổng thời gian (giây)
+    - root_move_time[move]: tổng thời gian tìm nhánh của từng nước ở gốc (cộng qua các vòng sâu dần)
+    - depth_time: [(depth, giây)] của từng vòng tìm hoàn tất
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.nodes = 0
+        self.leaf_evals = 0
+        self.cutoffs_by_index = []
+        self.check_winner_calls = 0
+        self.check_winner_time = 0.0
+        self.root_move_time = {}
+        self.depth_time = []
+
+    def record_cutoff(self, index: int):
+        cutoffs = self.cutoffs_by_index
+        if index >= len(cutoffs):
+            cutoffs.extend([0] * (index + 1 - len(cutoffs)))
+        cutoffs[index] += 1
+
+    def record_root_move(self, move, elapsed: float):
+        self.root_move_time[move] = self.root_move_time.get(move, 0.0) + elapsed
+
+    def attach(self, board: Board):
+        #Đo check_winner của đúng bàn cờ này (gán đè trên đối tượng, không sửa lớp Board)
+        check_winner = type(board).check_winner.__get__(board)
+
+        def timed_check_winner():
+            start = time.perf_counter()
+            winner = check_winner()
+            self.check_winner_time += time.perf_counter() - start
+            self.check_winner_calls += 1
+            return winner
+
+        board.check_winner = timed_check_winner
+
+    @staticmethod
+    def detach(board: Board):
+        board.__dict__.pop("check_winner", None)
+
+    def to_dict(self) -> dict:
+        return {
+            "nodes": self.nodes,
+            "leaf_evals": self.leaf_evals,
+            "cutoffs_by_index": list(self.cutoffs_by_index),
+            "check_winner_calls": self.check_winner_calls,
+            "check_winner_time": self.check_winner_time,
+            "root_move_time": {f"{row},{col}": t for (row, col), t in self.root_move_time.items()},
+            "depth_time": [list(item) for item in self.depth_time],
+        }
+
+
+#CLASS SẮP XẾP NƯỚC ĐI
+class MoveOrderer:
+    """
+    Sắp xếp nước đi để alpha-beta cắt tỉa sớm, thứ tự ưu tiên:
+    1) Nước thắng ngay, rồi nước chặn đối thủ thắng ngay
+    2) Nước tốt nhất lưu trong bảng chuyển vị
+    3) Killer move: nước từng gây cắt tỉa ở cùng tầng (ply)
+    4) History heuristic: điểm cộng dồn của nước gây cắt tỉa, giữ qua các nước của ván
+    Có thể tắt từng phần hoặc thay bằng lớp khác có cùng hàm order/record_cutoff.
+    """
+
+    def __init__(self, use_threats: bool = True, use_killers: bool = True, use_history: bool = True):
+        self.use_threats = use_threats
+        self.use_killers = use_killers
+        self.use_history = use_history
+        self.killers = {}   #ply -> [killer 1, killer 2]
+        self.history = {}   #(row, col, player) -> điểm
+
+    def new_search(self):
+        #Killer chỉ đúng trong 1 lượt tìm kiếm; history được giảm một nửa thay vì xóa
+        self.killers = {}
+        for key in self.history:
+            self.history[key] //= 2
+
+    def order(self, board: Board, moves, player: int, ply: int, tt_move=None, threats: bool = True):
+        """
+        Trả về danh sách nước đi đã sắp xếp.
+        threats=False: bỏ kiểm tra thắng/chặn ngay (dùng ở nút sát lá, nơi kiểm tra tốn hơn lợi)
+        """
+        opponent = -player
+        killers = self.killers.get(ply, ()) if self.use_killers else ()
+        history = self.history if self.use_history else {}
+        #Ô thắng ngay lấy từ các cửa sổ còn thiếu 1 quân (cập nhật dần trong Board), không quét bàn
+        threats = threats and self.use_threats
+        win_cells = board.winning_cells(player) if threats else ()
+        block_cells = board.winning_cells(opponent) if threats else ()
+
+        scored = []
+        for move in moves:
+            row, col = move
+            if move in win_cells:
+                score = 4 * INF
+            elif move in block_cells:
+                score = 3 * INF
+            elif move == tt_move:
+                score = 2 * INF
+            elif move in killers:
+                score = INF
+            else:
+                score = history.get((row, col, player), 0)
+            scored.append((score, move))
+        #sort ổn định: các nước cùng điểm giữ thứ tự hàng -> cột
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [move for _, move in scored]
+
+    def record_cutoff(self, move, player: int, ply: int, depth: int):
+        #Ghi nhận nước gây cắt tỉa beta
+        if self.use_killers:
+            slot = self.killers.setdefault(ply, [None, None])
+            if slot[0] != move:
+                slot[1] = slot[0]
+                slot[0] = move
+        if self.use_history:
+            key = (move[0], move[1], player)
+            self.history[key] = self.history.get(key, 0) + depth * depth
+
+
+#CLASS TÌM THẮNG CƯỠNG ÉP (THREAT-SPACE SEARCH)
+class ThreatSolver:
+    """
+    Tìm chuỗi đe dọa liên tục dẫn tới thắng, chỉ xét nước cưỡng ép nên nhìn được rất sâu:
+    - VCF (victory by continuous fours): bên tấn công liên tục tạo "4" (còn 1 nước là thắng),
+      bên phòng thủ buộc phải chặn đúng 1 ô
+    - VCT (victory by continuous threats, use_threes=True): thêm nước tạo "3" mà nước kế tiếp
+      sẽ thành 2 ô thắng cùng lúc; bên phòng thủ được thử mọi ô trống trên các cửa sổ liên quan
+      và mọi nước tạo "4" phản công
+    Có giới hạn số nút, thời gian và độ sâu (nửa nước) riêng; stop_event.set() dừng như hết giờ.
+    """
+
+    def __init__(self, board: Board, max_nodes: int = 20000, time_limit: float = 0.3,
+                 max_depth: int = 20, use_threes: bool = True, stop_event: threading.Event | None = None):
+        self.board = board
+        self.max_nodes = max_nodes
+        self.time_limit = time_limit
+        self.max_depth = max_depth
+        self.use_threes = use_threes
+        self.stop_event = stop_event
+        self.nodes = 0
+        self._deadline = 0.0
+
+    def find_win(self, attacker: int):
+        """
+        Giả sử attacker được đi ngay, trả về nước mở đầu chuỗi thắng cưỡng ép hoặc None.
+        Tìm sâu dần theo độ sâu để ưu tiên chuỗi ngắn nhất.
+        """
+        self.nodes = 0
+        self._deadline = time.perf_counter() + self.time_limit
+        history_len = len(self.board.history)
+        try:
+            for depth in range(1, self.max_depth + 1, 2):
+                move = self._attack(attacker, depth)
+                if move is not None:
+                    return move
+        except SearchTimeout:
+            while len(self.board.history) > history_len:
+                self.board.undo_move()
+        return None
+
+    def _tick(self):
+        self.nodes += 1
+        if self.nodes > self.max_nodes:
+            raise SearchTimeout
+        if self.nodes & 63 == 0 and (time.perf_counter() > self._deadline
+                                      or (self.stop_event is not None and self.stop_event.is_set())):
+            raise SearchTimeout
+
+    def _attack(self, attacker: int, depth: int):
+        #Lượt bên tấn công: trả về nước thắng cưỡng ép hoặc None
+        self._tick()
+        board = self.board
+        defender = -attacker
+        wins = board.winning_cells(attacker)
+        if wins:
+            return min(wins)
+        threats = board.winning_cells(defender)
+        if len(threats) >= 2 or depth <= 0:
+            return None
+
+        #Tạo "4": nếu đối thủ đang dọa thắng thì nước "4" phải đồng thời chặn
+        fours = board.window_cells(attacker, board.win_length - 2)
+        if threats:
+            fours &= threats
+        for move in sorted(fours):
+            board.place_move(move[0], move[1], attacker)
+            try:
+                won = self._defend_four(attacker, depth - 1)
+            finally:
+                board.remove_move(move[0], move[1])
+            if won:
+                return move
+
+        if not self.use_threes or threats or depth < 3 or board.win_length < 4:
+            return None
+        for move in sorted(board.window_cells(attacker, board.win_length - 3) - fours):
+            board.place_move(move[0], move[1], attacker)
+            try:
+                won = self._has_double_threat(attacker) and self._defend_three(attacker, depth - 1)
+            finally:
+                board.remove_move(move[0], move[1])
+            if won:
+                return move
+        return None
+
+    def _defend_four(self, attacker: int, depth: int) -> bool:
+        #Sau nước "4": bên phòng thủ thắng trước, không chặn nổi, hoặc chặn rồi tấn công tiếp
+        board = self.board
+        defender = -attacker
+        if board.winning_cells(defender):
+            return False
+        wins = board.winning_cells(attacker)
+        if len(wins) >= 2:
+            return True
+        if not wins:
+            return False
+        row, col = wins.pop()
+        board.place_move(row, col, defender)
+        try:
+            return self._attack(attacker, depth - 1) is not None
+        finally:
+            board.remove_move(row, col)
+
+    def _has_double_threat(self, attacker: int) -> bool:
+        #Bên tấn công có nước tạo ra >= 2 ô thắng cùng lúc (tức "4 mở" hoặc "4-4") không
+        board = self.board
+        existing = board.winning_cells(attacker)
+        threes = board.threat_windows[attacker][board.win_length - 2]
+        for move in board.window_cells(attacker, board.win_length - 2):
+            #Ô thắng mới = ô trống còn lại của các cửa sổ "3" chứa move (không cần đánh thử)
+            wins = set(existing)
+            for w in board.cell_windows[move]:
+                if w in threes:
+                    for cell in board.windows[w]:
+                        if cell != move and board.get_cell(*cell) == EMPTY:
+                            wins.add(cell)
+            if len(wins) >= 2:
+                return True
+        return False
+
+    def _defend_three(self, attacker: int, depth: int) -> bool:
+        #Sau nước "3": mọi cách phòng thủ hợp lý đều vẫn thua thì mới tính là thắng
+        board = self.board
+        defender = -attacker
+        if board.winning_cells(defender):
+            return False
+        replies = (board.window_cells(attacker, board.win_length - 2)
+                   | board.window_cells(defender, board.win_length - 2))
+        for row, col in sorted(replies):
+            board.place_move(row, col, defender)
+            try:
+                refuted = self._attack(attacker, depth - 1) is None
+            finally:
+                board.remove_move(row, col)
+            if refuted:
+                return False
+        return True
+
+
+#CLASS BẢNG NƯỚC ĐI TÍNH SẴN
+class OpeningBook:
+    """
+    Bảng nước đi tính sẵn, tra cứu O(1) theo thế cờ.
+    - Thế cờ được đưa về dạng chuẩn qua 8 phép đối xứng của bàn vuông (4 phép xoay x lật),
+      nên các thế đối xứng nhau chỉ lưu 1 lần
+    - entries[khóa chuẩn] = (row, col, value): nước đi (trong hệ tọa độ chuẩn) và giá trị
+      theo phía bên đang đến lượt. Bên đến lượt suy ra từ số quân (X luôn đi trước)
+    Dùng cho: lời giải toàn bộ bàn 3x3 (solve) và khai cuộc vài nước đầu cho 5x5/10x10 (build).
+    """
+
+    SYMBOLS = {EMPTY: ".", HUMAN: "X", AI: "O"}
+
+    def __init__(self, size: int, win_length: int, entries: dict | None = None):
+        self.size = size
+        self.win_length = win_length
+        self.entries = entries if entries is not None else {}
+        #perms[t][j]: ô gốc (chỉ số phẳng) nằm ở vị trí j sau phép đối xứng t
+        n = size - 1
+        maps = [
+            lambda r, c: (r, c), lambda r, c: (c, n - r), lambda r, c: (n - r, n - c), lambda r, c: (n - c, r),
+            lambda r, c: (r, n - c), lambda r, c: (c, r), lambda r, c: (n - r, c), lambda r, c: (n - c, n - r),
+        ]
+        self.perms = []
+        for f in maps:
+            perm = [0] * (size * size)
+            for r in range(size):
+                for c in range(size):
+                    tr, tc = f(r, c)
+                    perm[tr * size + tc] = r * size + c
+            self.perms.append(perm)
+
+    def canonical(self, board: Board):
+        #Trả về (khóa chuẩn, phép đối xứng t đã dùng)
+        symbols = self.SYMBOLS
+        cells = [symbols[board.get_cell(r, c)] for r in range(self.size) for c in range(self.size)]
+        best_key = None
+        best_t = 0
+        for t, perm in enumerate(self.perms):
+            key = "".join([cells[i] for i in perm])
+            if best_key is None or key < best_key:
+                best_key = key
+                best_t = t
+        return best_key, best_t
+
+    def to_canonical(self, move, t: int):
+        #Đổi nước đi từ tọa độ bàn thật sang tọa độ chuẩn theo phép t
+        index = self.perms[t].index(move[0] * self.size + move[1])
+        return divmod(index, self.size)
+
+    def from_canonical(self, move, t: int):
+        #Đổi nước đi từ tọa độ chuẩn về tọa độ bàn thật
+        return divmod(self.perms[t][move[0] * self.size + move[1]], self.size)
+
+    def lookup(self, board: Board):
+        #Tra nước đi cho bên đang đến lượt, None nếu không có trong bảng
+        entry = self.lookup_entry(board)
+        return entry[0] if entry is not None else None
+
+    def lookup_entry(self, board: Board):
+        #Như lookup nhưng trả về (nước đi, giá trị theo phía bên đang đến lượt)
+        if board.size != self.size or board.win_length != self.win_length:
+            return None
+        key, t = self.canonical(board)
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        return self.from_canonical((entry[0], entry[1]), t), entry[2]
+
+    def add(self, board: Board, move, value: int):
+        key, t = self.canonical(board)
+        row, col = self.to_canonical(move, t)
+        self.entries[key] = (row, col, value)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def save(self, path: str):
+        data = {
+            "size": self.size,
+            "win_length": self.win_length,
+            "entries": {key: list(entry) for key, entry in self.entries.items()},
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, path: str) -> "OpeningBook":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        entries = {key: tuple(entry) for key, entry in data["entries"].items()}
+        return cls(data["size"], data["win_length"], entries)
+
+    @staticmethod
+    def default_path(size: int) -> str:
+        return os.path.join(os.path.dirname(os.path.abspath(__file__)), f"caro_book_{size}x{size}.json")
+
+    @classmethod
+    def load_default(cls, size: int, win_length: int) -> "OpeningBook | None":
+        """
+        Bảng mặc định cho giao diện:
+        - Có file caro_book_NxN.json cạnh chương trình -> đọc file
+        - Bàn 3x3 chưa có file -> giải toàn bộ ngay trong bộ nhớ (chỉ vài trăm thế cờ)
+        """
+        path = cls.default_path(size)
+        if os.path.exists(path):
+            book = cls.load(path)
+            if book.win_length == win_length:
+                return book
+        if size == 3:
+            return cls.solve(size, win_length)
+        return None
+
+    @classmethod
+    def solve(cls, size: int, win_length: int) -> "OpeningBook":
+        """
+        Giải toàn bộ cây trò chơi (chỉ dùng cho bàn nhỏ như 3x3) bằng negamax có ghi nhớ.
+        Khi giải: thắng = số ô trống còn lại + 1 (thắng càng sớm càng tốt), hòa = 0, thua < 0.
+        Giá trị ghi vào bảng được đổi về cùng đơn vị với AIPlayer (build): +-WIN_SCORE hoặc 0.
+        """
+        book = cls(size, win_length)
+        board = Board(size, win_length, candidate_radius=None)
+        values = {}
+
+        def negamax(player: int) -> int:
+            key, t = book.canonical(board)
+            if key in values:
+                return values[key]
+            best_value = -INF
+            best_move = None
+            for (row, col) in board.empty_cells():
+                board.place_move(row, col, player)
+                if board.check_winner() is not None:
+                    value = size * size - board.stone_count + 1
+                elif board.is_full():
+                    value = 0
+                else:
+                    value = -negamax(-player)
+                board.remove_move(row, col)
+                if value > best_value:
+                    best_value = value
+                    best_move = (row, col)
+            values[key] = best_value
+            book_value = WIN_SCORE if best_value > 0 else -WIN_SCORE if best_value < 0 else 0
+            book.entries[key] = book.to_canonical(best_move, t) + (book_value,)
+            return best_value
+
+        negamax(HUMAN)
+        return book
+
+    @classmethod
+    def build(cls, size: int, win_length: int, plies: int, book_player: int = AI,
+              depth: int | None = None, time_limit: float | None = None) -> "OpeningBook":
+        """
+        Tạo khai cuộc cho bàn lớn: duyệt mọi thế cờ có tối đa plies quân, trong đó
+        - đến lượt book_player: tìm nước tốt nhất bằng AIPlayer rồi chỉ đi tiếp nước đó
+        - đến lượt đối thủ: thử mọi nước trong generate_moves (bỏ các thế đối xứng đã gặp)
+        """
+        book = cls(size, win_length)
+        board = new_board(size, win_length)
+        seen = set()
+
+        def expand(player: int):
+            key, _ = book.canonical(board)
+            if key in seen or board.stone_count >= plies or board.game_over():
+                return
+            seen.add(key)
+            if player == book_player:
+                ai = AIPlayer(board, ai_player=player, human_player=-player,
+                              time_limit=time_limit, max_depth=depth)
+                move = ai.find_best_move()
+                if move is None:
+                    return
+                book.add(board, move, ai.best_value)
+                next_moves = [move]
+            else:
+                next_moves = board.generate_moves()
+            for (row, col) in next_moves:
+                board.place_move(row, col, player)
+                expand(-player)
+                board.remove_move(row, col)
+
+        expand(HUMAN)
+        return book
+
+
+#TÌM KIẾM SONG SONG Ở GỐC
+#Bảng chuyển vị riêng của mỗi tiến trình con, giữ lại giữa các tác vụ: key -> [bảng, search_id gần nhất]
+_WORKER_TT = {}
+#Bộ sắp xếp nước đi của lượt tìm kiếm hiện tại trong tiến trình con: (search_id, orderer)
+_WORKER_ORDERER = [None, None]
+#Cờ hủy dùng chung với tiến trình cha (multiprocessing.Event, gán khi tiến trình con khởi động)
+_WORKER_CANCEL = [None]
+
+
+def _init_search_worker(cancel_event):
+    _WORKER_CANCEL[0] = cancel_event
+
+
+def _search_root_move(task):
+    """
+    Chạy trong tiến trình con: dựng lại bàn cờ, đánh nước gốc move rồi tìm tiếp depth - 1
+    với cửa sổ rỗng (alpha, alpha + 1); chỉ tìm lại đầy đủ khi nước này tốt hơn alpha.
+    Trả về (move, value, nodes, giây); value = None nếu hết thời gian.
+    """
+    board_spec, config, search_id, orderer, move, depth, alpha, time_left = task
+    if _WORKER_CANCEL[0] is not None and _WORKER_CANCEL[0].is_set():
+        return move, None, 0, 0.0
+    board_cls, size, win_length, radius, played = board_spec
+    ai_player, human_player, tt_size, tt_policy = config
+
+    board = board_cls(size, win_length, radius)
+    for row, col, player in played:
+        board.place_move(row, col, player)
+
+    #Các tác vụ cùng lượt tìm kiếm dùng tiếp killer/history đã học ở tác vụ trước
+    if _WORKER_ORDERER[0] != search_id:
+        _WORKER_ORDERER[0] = search_id
+        _WORKER_ORDERER[1] = orderer
+    ai = AIPlayer(board, ai_player, human_player, tt_size=0, move_orderer=_WORKER_ORDERER[1])
+    if tt_size > 0:
+        key = (board_cls, size, win_length, radius, ai_player, tt_size, tt_policy)
+        if key not in _WORKER_TT:
+            _WORKER_TT[key] = [TranspositionTable(tt_size, tt_policy), None]
+        slot = _WORKER_TT[key]
+        #Lượt tìm kiếm mới -> tăng thế hệ để ô của các lượt trước không chặn ô mới, xóa bộ đếm
+        if slot[1] != search_id:
+            slot[0].new_search()
+            slot[1] = search_id
+        ai.tt = slot[0]
+    ai._root_stones = board.stone_count
+    #Tiến trình cha bật cờ hủy khi stop_event của nó được set -> dừng như hết giờ
+    ai.stop_event = _WORKER_CANCEL[0]
+    ai._deadline = time.perf_counter() + time_left if time_left is not None else math.inf
+
+    start = time.perf_counter()
+    board.place_move(move[0], move[1], ai_player)
+    try:
+        value = -ai.negamax(depth - 1, -alpha - 1, -alpha, human_player)
+        if value > alpha:
+            value = -ai.negamax(depth - 1, -INF, -alpha, human_player)
+    except SearchTimeout:
+        value = None
+    return move, value, ai.nodes, time.perf_counter() - start
+
+
 #CLASS AI - MINIMAX
 class AIPlayer:
-    def __init__(self, board: Board, ai_player: int = AI, human_player: int = HUMAN):
+    def __init__(self, board: Board, ai_player: int = AI, human_player: int = HUMAN,
+                 tt_size: int = 1 << 16, tt_policy: str = "depth",
+                 time_limit: float | None = None, max_depth: int | None = None,
+                 move_orderer: MoveOrderer | None = None, workers: int = 1,
+                 book: OpeningBook | None = None, threat_search: bool = True,
+                 threat_nodes: int = 20000, threat_time: float = 0.3, trace: bool = False,
+                 aspiration_window: int | None = ASPIRATION_WINDOW, batch_eval: bool = False):
+        """
+        tt_size: số ô của bảng chuyển vị (0 = tắt bảng chuyển vị)
+        tt_policy: chính sách thay thế của bảng ("depth" hoặc "always")
+        time_limit: thời gian suy nghĩ mỗi nước (giây). None -> tìm ở độ sâu cố định
+        max_depth: độ sâu tối đa (số nửa nước tính cả nước của AI). None -> tự chọn
+        move_orderer: bộ sắp xếp nước đi (None -> MoveOrderer mặc định)
+        workers: số tiến trình chia nhau các nước ở gốc (1 = tìm tuần tự)
+        book: bảng nước đi tính sẵn, tra trước khi tìm kiếm
+        threat_search: chạy ThreatSolver trước alpha-beta trên bàn 5 quân thắng
+        threat_nodes, threat_time: quỹ số nút / thời gian (giây) chung cho cả giai đoạn tìm đe dọa mỗi nước
+        trace: ghi số liệu chi tiết của từng lượt tìm vào self.trace (SearchStats)
+        aspiration_window: nửa độ rộng cửa sổ aspiration khi tìm sâu dần (None = luôn tìm cửa sổ đầy đủ)
+        batch_eval: chấm mọi nước con của nút sát lá cùng lúc bằng BatchEvaluator (cần numpy)
+        """
         self.board = board
         self.ai_player = ai_player
         self.human_player = human_player
+        self.tt = TranspositionTable(tt_size, tt_policy) if tt_size > 0 else None
+        self.time_limit = time_limit
+        self.max_depth = max_depth
+        #Kết quả lượt tìm kiếm gần nhất
+        self.completed_depth = 0
+        self.best_value = 0
+        self.nodes = 0
+        #Biến chính (chuỗi nước dự kiến của 2 bên, bắt đầu bằng nước của AI)
+        self.pv = []
+        #_pv[ply]: biến chính của nút đang tìm ở tầng ply (ghi trong negamax)
+        self._pv = {}
+        self.aspiration_window = aspiration_window
+        self.batch_evaluator = BatchEvaluator(board.size, board.win_length) if batch_eval else None
+        #Số lần cửa sổ aspiration bị vượt phải tìm lại
+        self.aspiration_researches = 0
+        self._deadline = None
+        self.move_orderer = move_orderer if move_orderer is not None else MoveOrderer()
+        self.workers = workers
+        self._executor = None
+        self._cancel_event = None
+        self._search_id = 0
+        self.book = book
+        self.book_hit = False
+        self.threat_search = threat_search
+        self.threat_nodes = threat_nodes
+        self.threat_time = threat_time
+        self.threat_hit = False
+        self.threat_nodes_used = 0
+        #Điều khiển từ bên ngoài khi tìm sâu dần (dùng cho luồng nền của giao diện):
+        #stop_event.set() -> dừng sớm, trả kết quả vòng hoàn tất gần nhất
+        #on_progress(depth, best_move, value) -> gọi sau mỗi vòng hoàn tất
+        self.stop_event: threading.Event | None = None
+        self.on_progress = None
+        #Thống kê cắt tỉa của lượt tìm kiếm gần nhất
+        self.interior_nodes = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.search_time = 0.0
+        self._root_stones = 0
+        #Số liệu chi tiết (None = tắt); có thể bật/tắt giữa các lượt bằng cách gán lại
+        self.trace: SearchStats | None = SearchStats() if trace else None
 
     def evaluate(self) -> int:
         """
-        Hàm heuristic đơn giản:
-        - AI thắng  -> +100000
-        - HUMAN thắng -> -100000
-        - Chưa ai thắng -> (số quân AI - số quân HUMAN)
+        Hàm heuristic:
+        - AI thắng  -> +WIN_SCORE
+        - HUMAN thắng -> -WIN_SCORE
+        - Chưa ai thắng -> điểm mẫu đường 2/3/4 của AI trừ của HUMAN (Board.pattern_score_for)
         """
         winner = self.board.check_winner()
         if winner == self.ai_player:
-            return 100000
+            return WIN_SCORE
         elif winner == self.human_player:
-            return -100000
-
-        ai_count = 0
-        human_count = 0
-        for row in self.board.grid:
-            for cell in row:
-                if cell == self.ai_player:
-                    ai_count += 1
-                elif cell == self.human_player:
-                    human_count += 1
+            return -WIN_SCORE
 
-        return ai_count - human_count
+        return self.board.pattern_score_for(self.ai_player)
 
-    def minimax(self, depth: int, alpha: int, beta: int, is_max_player_turn: bool) -> int:
+    def negamax(self, depth: int, alpha: int, beta: int, player: int) -> int:
         """
-        Thuật toán Minimax có cắt tỉa Alpha-Beta.
+        Negamax có cắt tỉa Alpha-Beta và tìm theo biến chính (PVS).
         depth: độ sâu còn lại
-        alpha, beta: biên alpha-beta
-        is_max_player_turn: True nếu đến lượt AI (MAX), False nếu lượt người (MIN)
+        alpha, beta: biên alpha-beta theo phía player
+        player: bên đang đi; giá trị trả về tính theo phía player (= -giá trị theo phía đối thủ)
+        Nước đầu tiên (theo thứ tự đã sắp) được tìm với cửa sổ đầy đủ, các nước sau chỉ tìm với
+        cửa sổ rỗng (alpha, alpha + 1) để chứng minh không tốt hơn; vượt alpha thì tìm lại đầy đủ.
+        Biến chính của nút được ghi vào self._pv[ply].
         """
-        if depth == 0 or self.board.game_over():
-            return self.evaluate()
+        self.nodes += 1
+        if self._deadline is not None and self.nodes & 1023 == 0 and self._should_stop():
+            raise SearchTimeout
 
-        if is_max_player_turn:
-            best_value = -INF
-            for (row, col) in self.board.generate_moves():
-                self.board.place_move(row, col, self.ai_player)
-                value = self.minimax(depth - 1, alpha, beta, False)
-                self.board.remove_move(row, col)
-                best_value = max(best_value, value)
-                alpha = max(alpha, best_value)
-                if beta <= alpha:
-                    break  #Cắt tỉa
-            return best_value
-        else:
-            best_value = INF
-            for (row, col) in self.board.generate_moves():
-                self.board.place_move(row, col, self.human_player)
-                value = self.minimax(depth - 1, alpha, beta, True)
-                self.board.remove_move(row, col)
-                best_value = min(best_value, value)
-                beta = min(beta, best_value)
-                if beta <= alpha:
-                    break  #Cắt tỉa
-            return best_value
+        board = self.board
+        ply = board.stone_count - self._root_stones
+        pv = self._pv
+        pv[ply] = []
+        trace = self.trace
+        if trace is not None:
+            trace.nodes += 1
+        if depth == 0 or board.game_over():
+            if trace is not None:
+                trace.leaf_evals += 1
+            value = self.evaluate()
+            return value if player == self.ai_player else -value
 
-    def find_best_move(self):
-        #Tìm nước đi tốt nhất cho AI dựa trên Minimax + Alpha-Beta
+        #Tra bảng chuyển vị: chỉ dùng giá trị cùng độ sâu để kết quả giống hệt khi không có bảng
+        tt = self.tt
+        tt_move = None
+        if tt is not None:
+            key = board.hash ^ board.side_key if player == self.ai_player else board.hash
+            entry = tt.probe(key)
+            if entry is not None:
+                _, entry_depth, entry_value, flag, tt_move, _ = entry
+                if entry_depth == depth and (
+                        flag == EXACT
+                        or (flag == LOWER and entry_value >= beta)
+                        or (flag == UPPER and entry_value <= alpha)):
+                    tt.cutoffs += 1
+                    return entry_value
+            alpha_orig = alpha
+
+        self.interior_nodes += 1
+        opponent = self.human_player if player == self.ai_player else self.ai_player
+        moves = self.move_orderer.order(board, board.generate_moves(), player, ply, tt_move,
+                                        threats=depth > 1)
+        #Nút sát lá: nước đầu thường đã cắt tỉa được, nếu không thì chấm các nước còn lại cùng lúc
+        batch = depth == 1 and self.batch_evaluator is not None
+
+        best_value = -INF
+        best_move = None
+        for index, (row, col) in enumerate(moves):
+            if batch and index == 1:
+                value, move = self._evaluate_frontier(player, moves[1:])
+                if value > best_value:
+                    best_value = value
+                    best_move = move
+                    if value > alpha:
+                        alpha = value
+                        pv[ply] = [best_move]
+                        if alpha >= beta:
+                            self._record_cutoff(best_move, player, ply, depth, moves.index(move))
+                break
+            board.place_move(row, col, player)
+            if index == 0:
+                value = -self.negamax(depth - 1, -beta, -alpha, opponent)
+            else:
+                value = -self.negamax(depth - 1, -alpha - 1, -alpha, opponent)
+                if alpha < value < beta:
+                    value = -self.negamax(depth - 1, -beta, -alpha, opponent)
+            board.remove_move(row, col)
+            if value > best_value:
+                best_value = value
+                best_move = (row, col)
+                if value > alpha:
+                    alpha = value
+                    pv[ply] = [best_move] + pv.get(ply + 1, [])
+                    if alpha >= beta:
+                        self._record_cutoff(best_move, player, ply, depth, index)
+                        break  #Cắt tỉa
+
+        if tt is not None:
+            if best_value <= alpha_orig:
+                flag = UPPER
+            elif best_value >= beta:
+                flag = LOWER
+            else:
+                flag = EXACT
+            tt.store(key, depth, best_value, flag, best_move)
+        return best_value
+
+    def _evaluate_frontier(self, player: int, moves):
+        #Chấm cùng lúc các thế sau 1 nước của player trong moves
+        #Trả về (giá trị tốt nhất theo phía player, nước đầu tiên đạt giá trị đó)
+        if self._deadline is not None and self._should_stop():
+            raise SearchTimeout
+        evaluator = self.batch_evaluator
+        values = evaluator.evaluate(evaluator.children(self.board, moves, player), player)
+        index = int(values.argmax())
+        self.nodes += len(moves)
+        if self.trace is not None:
+            self.trace.nodes += len(moves)
+            self.trace.leaf_evals += len(moves)
+        return int(values[index]), moves[index]
+
+    def _should_stop(self) -> bool:
+        #Hết giờ hoặc bị yêu cầu dừng
+        if self.stop_event is not None and self.stop_event.is_set():
+            return True
+        return time.perf_counter() > self._deadline
+
+    def _record_cutoff(self, move, player: int, ply: int, depth: int, index: int):
+        self.cutoffs += 1
+        if index == 0:
+            self.first_move_cutoffs += 1
+        if self.trace is not None:
+            self.trace.record_cutoff(index)
+        self.move_orderer.record_cutoff(move, player, ply, depth)
+
+    def pruning_stats(self) -> dict:
+        """
+        Thống kê lượt tìm kiếm gần nhất để đo hiệu quả sắp xếp nước đi:
+        - cutoff_rate: tỉ lệ nút trong bị cắt tỉa
+        - first_move_cutoff_rate: tỉ lệ cắt tỉa xảy ra ngay ở nước đầu tiên (càng gần 1 càng tốt)
+        - tt_*: số lần tra / trúng / cắt nhánh nhờ bảng chuyển vị (0 khi không dùng bảng)
+        """
+        tt = self.tt.stats() if self.tt is not None else {}
+        return {
+            "size": self.board.get_size(),
+            "depth": self.completed_depth,
+            "nodes": self.nodes,
+            "interior_nodes": self.interior_nodes,
+            "cutoffs": self.cutoffs,
+            "first_move_cutoffs": self.first_move_cutoffs,
+            "cutoff_rate": self.cutoffs / self.interior_nodes if self.interior_nodes else 0.0,
+            "first_move_cutoff_rate": self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0,
+            "time": self.search_time,
+            "nodes_per_second": self.nodes / self.search_time if self.search_time else 0.0,
+            "aspiration_researches": self.aspiration_researches,
+            "pv": self.pv,
+            "threat_nodes": self.threat_nodes_used,
+            "threat_hit": self.threat_hit,
+            "book_hit": self.book_hit,
+            "tt_probes": tt.get("probes", 0),
+            "tt_hits": tt.get("hits", 0),
+            "tt_cutoffs": tt.get("cutoffs", 0),
+            "tt_hit_rate": tt.get("hit_rate", 0.0),
+            "tt_cutoff_rate": tt.get("cutoff_rate", 0.0),
+        }
+
+    def fixed_depth(self) -> int:
+        #Độ sâu khi không giới hạn thời gian (tính cả nước của AI ở gốc)
+        if self.max_depth is not None:
+            return self.max_depth
         size = self.board.get_size()
 
         #Chọn depth limit tùy kích thước bàn
@@ -165,21 +1374,713 @@ class AIPlayer:
             depth_limit = 3
         else:
             depth_limit = 2    # 10x10 để tránh lag
+        return depth_limit + 1
 
+    def search_root(self, depth: int, moves, alpha: int = -INF, beta: int = INF):
+        """
+        Duyệt các nước ở gốc theo thứ tự moves, mỗi nhánh tìm tiếp depth - 1.
+        Trả về (best_value, best_move); biến chính ghi vào self.pv.
+        alpha, beta: cửa sổ tìm ở gốc (cửa sổ hẹp của aspiration); kết quả <= alpha hoặc >= beta
+        chỉ là cận, phải tìm lại với cửa sổ rộng hơn. Tìm song song luôn dùng cửa sổ đầy đủ.
+        """
+        if self.workers > 1 and len(moves) > 1:
+            return self._parallel_search_root(depth, moves)
+        return self._serial_search_root(depth, moves, alpha, beta)
+
+    def _serial_search_root(self, depth: int, moves, alpha: int = -INF, beta: int = INF):
+        #PVS ở gốc: nước đầu cửa sổ đầy đủ, các nước sau cửa sổ rỗng rồi tìm lại nếu tốt hơn
         best_value = -INF
         best_move = None
+        self.pv = []
 
-        for (row, col) in self.board.generate_moves():
+        trace = self.trace
+        for index, (row, col) in enumerate(moves):
+            if trace is not None:
+                start = time.perf_counter()
             self.board.place_move(row, col, self.ai_player)
-            value = self.minimax(depth_limit, -INF, INF, False)
-            self.board.remove_move(row, col)
+            try:
+                if index == 0:
+                    value = -self.negamax(depth - 1, -beta, -alpha, self.human_player)
+                else:
+                    value = -self.negamax(depth - 1, -alpha - 1, -alpha, self.human_player)
+                    if alpha < value < beta:
+                        value = -self.negamax(depth - 1, -beta, -alpha, self.human_player)
+            finally:
+                self.board.remove_move(row, col)
+                if trace is not None:
+                    trace.record_root_move((row, col), time.perf_counter() - start)
 
             if value > best_value:
                 best_value = value
                 best_move = (row, col)
+                if value > alpha:
+                    alpha = value
+                    self.pv = [best_move] + self._pv.get(1, [])
+                    if alpha >= beta:
+                        break
+
+        if not self.pv:
+            self.pv = [best_move]
+        return best_value, best_move
 
+    def _parallel_search_root(self, depth: int, moves):
+        """
+        Tìm song song ở gốc:
+        - Đoán nước tốt nhất (tìm nông hơn 2 tầng nếu không có vòng lặp sâu dần trước đó),
+          tìm tuần tự nước đó với cửa sổ đầy đủ để có giá trị v
+        - Các nước còn lại chia cho các tiến trình con với alpha = v (đứng sau nước đoán)
+          hoặc v - 1 (đứng trước nước đoán, để biết nước đó có bằng v không)
+        Kết quả: nước đầu tiên theo thứ tự moves có giá trị lớn nhất, giống hệt tìm tuần tự.
+        """
+        guess = moves[0]
+        if self._deadline is None and depth > 2:
+            guess = self._serial_search_root(depth - 2, moves)[1]
+
+        row, col = guess
+        self.board.place_move(row, col, self.ai_player)
+        try:
+            guess_value = -self.negamax(depth - 1, -INF, INF, self.human_player)
+        finally:
+            self.board.remove_move(row, col)
+        guess_pv = [guess] + self._pv.get(1, [])
+
+        time_left = None
+        if self._deadline is not None:
+            time_left = self._deadline - time.perf_counter()
+            if time_left <= 0:
+                raise SearchTimeout
+
+        if self._executor is None:
+            self._cancel_event = multiprocessing.Event()
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_search_worker,
+                                                 initargs=(self._cancel_event,))
+        self._cancel_event.clear()
+        board_spec = (type(self.board), self.board.size, self.board.win_length,
+                      self.board.candidate_radius, self.board.moves_played())
+        tt_size = self.tt.size if self.tt is not None else 0
+        tt_policy = self.tt.policy if self.tt is not None else "depth"
+        config = (self.ai_player, self.human_player, tt_size, tt_policy)
+        #Gửi kèm bảng killer/history hiện tại để tiến trình con sắp xếp nước đi tốt như tìm tuần tự
+        self._search_id += 1
+        search_id = (id(self), self._search_id)
+        guess_index = moves.index(guess)
+        tasks = []
+        for index, move in enumerate(moves):
+            if move != guess:
+                alpha = guess_value - 1 if index < guess_index else guess_value
+                tasks.append((board_spec, config, search_id, self.move_orderer,
+                              move, depth, alpha, time_left))
+
+        #Chờ kết quả; stop_event được set giữa chừng thì báo các tiến trình con dừng ngay
+        pending = {self._executor.submit(_search_root_move, task) for task in tasks}
+        results = []
+        while pending:
+            done, pending = wait(pending, timeout=0.02, return_when=FIRST_EXCEPTION)
+            results.extend(future.result() for future in done)
+            if self.stop_event is not None and self.stop_event.is_set():
+                self._cancel_event.set()
+
+        values = {guess: guess_value}
+        timed_out = False
+        for move, value, nodes, elapsed in results:
+            self.nodes += nodes
+            if self.trace is not None:
+                self.trace.record_root_move(move, elapsed)
+            if value is None:
+                timed_out = True
+            else:
+                values[move] = value
+        if timed_out:
+            raise SearchTimeout
+
+        #Giá trị <= alpha chỉ là cận trên và luôn nhỏ hơn giá trị của nước đoán nên không ảnh hưởng
+        best_value = -INF
+        best_move = None
+        for move in moves:
+            if values[move] > best_value:
+                best_value = values[move]
+                best_move = move
+        #Tiến trình con không gửi biến chính về -> chỉ có đầy đủ khi nước đoán là nước tốt nhất
+        self.pv = guess_pv if best_move == guess else [best_move]
+        return best_value, best_move
+
+    def close(self):
+        #Tắt các tiến trình con của chế độ tìm song song
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+            self._cancel_event = None
+
+    def find_best_move(self, with_pv: bool = False):
+        """
+        Tìm nước đi tốt nhất cho AI dựa trên Negamax + Alpha-Beta (PVS).
+        with_pv=True -> trả về (nước đi, biến chính) thay vì chỉ nước đi.
+        """
+        trace = self.trace
+        if trace is not None:
+            trace.reset()
+            trace.attach(self.board)
+        try:
+            move = self._find_best_move()
+        finally:
+            if trace is not None:
+                SearchStats.detach(self.board)
+        if with_pv:
+            return move, list(self.pv)
+        return move
+
+    def _find_best_move(self):
+        if self.tt is not None:
+            self.tt.new_search()
+        self.move_orderer.new_search()
+        self.nodes = 0
+        self.interior_nodes = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.completed_depth = 0
+        self.aspiration_researches = 0
+        self.pv = []
+        self._pv = {}
+        self._root_stones = self.board.stone_count
+        start = time.perf_counter()
+        #Quỹ thời gian tính từ đầu nước đi: tìm đe dọa cũng trừ vào đây
+        deadline = start + self.time_limit if self.time_limit is not None else None
+        self.book_hit = False
+
+        moves = self.board.generate_moves()
+        if not moves:
+            return None
+
+        #Thế cờ có trong bảng tính sẵn -> trả lời ngay
+        entry = self.book.lookup_entry(self.board) if self.book is not None else None
+        if entry is not None:
+            move, value = entry
+            if self.board.get_cell(*move) == EMPTY:
+                self.book_hit = True
+                self.best_value = value
+                self.pv = [move]
+                self.search_time = time.perf_counter() - start
+                return move
+
+        #Tìm thắng cưỡng ép trước; nếu đối thủ có chuỗi thắng cưỡng ép thì chỉ giữ các nước phá được
+        self.threat_hit = False
+        self.threat_nodes_used = 0
+        if self.threat_search and self.board.win_length >= 5:
+            move, moves = self._threat_space(moves, deadline)
+            if move is not None:
+                self.threat_hit = True
+                self.best_value = WIN_SCORE
+                self.pv = [move]
+                self.search_time = time.perf_counter() - start
+                return move
+        moves = self.move_orderer.order(self.board, moves, self.ai_player, 0)
+
+        if self.time_limit is None:
+            depth = self.fixed_depth()
+            self.best_value, best_move = self.search_root(depth, moves)
+            self.completed_depth = depth
+            if self.trace is not None:
+                self.trace.depth_time.append((depth, time.perf_counter() - start))
+        else:
+            best_move = self._iterative_deepening(moves, deadline)
+        self.search_time = time.perf_counter() - start
         return best_move
 
+    def _threat_budget(self, stage_deadline: float):
+        #Phần còn lại của quỹ tìm đe dọa: (giây, số nút); (0, 0) nếu đã hết hoặc bị yêu cầu dừng
+        if self.stop_event is not None and self.stop_event.is_set():
+            return 0.0, 0
+        return max(0.0, stage_deadline - time.perf_counter()), max(0, self.threat_nodes - self.threat_nodes_used)
+
+    def _find_threat_win(self, solver: ThreatSolver, attacker: int, share: float, stage_deadline: float):
+        #Cho solver dùng tỉ lệ share của quỹ còn lại để tìm chuỗi thắng cưỡng ép của attacker
+        seconds, nodes = self._threat_budget(stage_deadline)
+        if seconds <= 0 or nodes <= 0:
+            return None
+        solver.time_limit = seconds * share
+        solver.max_nodes = max(1, int(nodes * share))
+        move = solver.find_win(attacker)
+        self.threat_nodes_used += solver.nodes
+        return move
+
+    def _threat_space(self, moves, deadline: float | None = None):
+        """
+        Trả về (nước thắng cưỡng ép hoặc None, danh sách nước ở gốc).
+        Khi đối thủ có VCF/VCT, bỏ các nước ở gốc mà sau đó đối thủ vẫn còn VCF.
+        threat_time/threat_nodes là quỹ chung của cả giai đoạn: tìm thắng cho AI (tối đa nửa quỹ),
+        tìm chuỗi thắng của đối thủ (tối đa nửa phần còn lại), phần cuối chia đều cho các nước cần
+        kiểm tra phòng thủ. deadline (hạn cả nước đi) cắt ngắn quỹ nếu sớm hơn.
+        Hết quỹ hoặc stop_event -> dừng, các nước chưa kiểm tra phòng thủ được giữ lại.
+        """
+        stage_deadline = time.perf_counter() + self.threat_time
+        if deadline is not None:
+            stage_deadline = min(stage_deadline, deadline)
+        solver = ThreatSolver(self.board, stop_event=self.stop_event)
+        move = self._find_threat_win(solver, self.ai_player, 0.5, stage_deadline)
+        if move is not None:
+            return move, moves
+        threat = self._find_threat_win(solver, self.human_player, 0.5, stage_deadline)
+        if threat is None:
+            return None, moves
+
+        defence = ThreatSolver(self.board, use_threes=False, stop_event=self.stop_event)
+        safe = []
+        for k, (row, col) in enumerate(moves):
+            seconds, nodes = self._threat_budget(stage_deadline)
+            if seconds <= 0 or nodes <= 0:
+                safe.extend(moves[k:])
+                break
+            self.board.place_move(row, col, self.ai_player)
+            if self._find_threat_win(defence, self.human_player, 1 / (len(moves) - k), stage_deadline) is None:
+                safe.append((row, col))
+            self.board.remove_move(row, col)
+        return None, (safe or moves)
+
+    def _iterative_deepening(self, moves, deadline: float | None = None):
+        """
+        Tìm sâu dần 1, 2, 3, ... cho tới khi hết thời gian:
+        - Nước tốt nhất của vòng trước được thử đầu tiên ở vòng sau
+        - Aspiration: vòng sau tìm trong cửa sổ hẹp quanh điểm vòng trước cùng tính chẵn lẻ,
+          vượt cửa sổ phía nào thì mở rộng phía đó và tìm lại
+        - Hết giờ (hoặc stop_event) giữa chừng -> bỏ vòng dở dang, trả kết quả vòng hoàn tất gần nhất
+        deadline: hạn chung của cả nước đi (None -> tính time_limit từ lúc bắt đầu vòng lặp)
+        """
+        start = time.perf_counter()
+        self._deadline = deadline if deadline is not None else start + self.time_limit
+        max_depth = self.max_depth or len(moves)
+        best_move = moves[0]
+        best_pv = [best_move]
+        #scores[d]: điểm của vòng độ sâu d
+        scores = {}
+        history_len = len(self.board.history)
+
+        try:
+            for depth in range(1, max_depth + 1):
+                if self.stop_event is not None and self.stop_event.is_set():
+                    break
+                depth_start = time.perf_counter()
+                try:
+                    window = self.aspiration_window
+                    if window is not None and depth > 2 and self.workers == 1:
+                        #Điểm dao động theo độ sâu chẵn/lẻ -> lấy tâm là điểm của vòng cùng tính chẵn lẻ
+                        center = scores[depth - 2]
+                        alpha = center - window
+                        beta = center + window
+                        value, move = self.search_root(depth, moves, alpha, beta)
+                        if value <= alpha:
+                            self.aspiration_researches += 1
+                            value, move = self.search_root(depth, moves, -INF, beta)
+                        elif value >= beta:
+                            self.aspiration_researches += 1
+                            value, move = self.search_root(depth, moves, alpha, INF)
+                    else:
+                        value, move = self.search_root(depth, moves)
+                except SearchTimeout:
+                    #Trả bàn cờ về trạng thái trước khi tìm
+                    while len(self.board.history) > history_len:
+                        self.board.undo_move()
+                    break
+
+                best_move = move
+                best_pv = self.pv
+                scores[depth] = value
+                self.best_value = value
+                self.completed_depth = depth
+                if self.trace is not None:
+                    self.trace.depth_time.append((depth, time.perf_counter() - depth_start))
+                moves.remove(move)
+                moves.insert(0, move)
+                if self.on_progress is not None:
+                    self.on_progress(depth, move, value)
+
+                #Đã thấy kết quả thắng/thua chắc chắn hoặc đã duyệt hết cây
+                if abs(value) >= WIN_SCORE or depth >= len(moves):
+                    break
+                if time.perf_counter() >= self._deadline:
+                    break
+        finally:
+            self._deadline = None
+
+        self.pv = best_pv
+        return best_move
+
+
+#CLASS AI - MONTE CARLO TREE SEARCH
+class MCTSNode:
+    """
+    Nút của cây MCTS.
+    player: bên vừa đánh nước move để tới nút này
+    wins: tổng kết quả các ván mô phỏng đi qua nút, tính theo phía player (thắng 1, hòa 0.5)
+    """
+    __slots__ = ("move", "player", "parent", "children", "untried", "visits", "wins")
+
+    def __init__(self, move, player: int, parent: "MCTSNode | None", untried):
+        self.move = move
+        self.player = player
+        self.parent = parent
+        self.children = {}
+        self.untried = untried
+        self.visits = 0
+        self.wins = 0.0
+
+
+class MCTSPlayer:
+    def __init__(self, board: Board, ai_player: int = AI, human_player: int = HUMAN,
+                 time_limit: float | None = 1.0, iterations: int | None = None,
+                 exploration: float = 1.4, rollout_batch: int = 4,
+                 rollout_limit: int | None = None, seed: int | None = None):
+        """
+        Cùng giao diện với AIPlayer (find_best_move, pruning_stats, close), dùng UCT:
+        time_limit: thời gian suy nghĩ mỗi nước (giây), None -> chỉ giới hạn theo iterations
+        iterations: số vòng chọn -> mở rộng -> mô phỏng -> lan truyền tối đa mỗi nước
+        exploration: hằng số C trong công thức UCT
+        rollout_batch: số ván mô phỏng chạy liền nhau từ mỗi nút mới mở rộng
+        rollout_limit: số nước tối đa mỗi ván mô phỏng (None = tới khi hết ván)
+        seed: hạt giống ngẫu nhiên (để kết quả lặp lại được)
+        """
+        if time_limit is None and iterations is None:
+            raise ValueError("Cần time_limit hoặc iterations")
+        self.board = board
+        self.ai_player = ai_player
+        self.human_player = human_player
+        self.time_limit = time_limit
+        self.iterations = iterations
+        self.exploration = exploration
+        self.rollout_batch = rollout_batch
+        self.rollout_limit = rollout_limit
+        self.rng = random.Random(seed)
+        #Cây giữ lại giữa các nước: gốc ứng với thế cờ có danh sách nước _root_moves
+        self._root: MCTSNode | None = None
+        self._root_moves = []
+        self.stop_event: threading.Event | None = None
+        self.on_progress = None
+        #Kết quả lượt tìm kiếm gần nhất (completed_depth = độ sâu lớn nhất của cây đã mở tới)
+        self.completed_depth = 0
+        self.best_value = 0
+        self.nodes = 0
+        self.iterations_done = 0
+        self.rollouts = 0
+        self.reused_visits = 0
+        self.search_time = 0.0
+
+    def _forced_moves(self, player: int):
+        #Nước bắt buộc của player: thắng ngay, nếu không thì chặn nước thắng của đối thủ
+        board = self.board
+        cells = board.winning_cells(player)
+        if not cells:
+            cells = board.winning_cells(-player)
+        return sorted(cells)
+
+    def _new_node(self, move, player: int, parent: "MCTSNode | None") -> MCTSNode:
+        #Các nước chưa thử của nút: chỉ nước bắt buộc nếu có, ngược lại các ô gần quân đã đánh
+        board = self.board
+        if board.game_over():
+            untried = []
+        else:
+            untried = self._forced_moves(-player) or board.generate_moves()
+            self.rng.shuffle(untried)
+        return MCTSNode(move, player, parent, untried)
+
+    def _reuse_root(self) -> MCTSNode:
+        """
+        Lấy lại cây của lượt trước: đi theo các nước đã đánh kể từ đó.
+        Không khớp (ván mới, hoàn tác, nước chưa mở rộng) -> tạo cây mới.
+        """
+        played = self.board.moves_played()
+        node = self._root
+        if node is not None and played[:len(self._root_moves)] == self._root_moves:
+            for row, col, _ in played[len(self._root_moves):]:
+                node = node.children.get((row, col))
+                if node is None:
+                    break
+            if node is not None and node.player == self.human_player:
+                node.parent = None
+                self._root_moves = played
+                return node
+        self._root_moves = played
+        return self._new_node(self.board.last_move, self.human_player, None)
+
+    def _select_child(self, node: MCTSNode) -> MCTSNode:
+        #UCT: wins/visits + C * sqrt(ln(N) / visits)
+        log_n = math.log(node.visits)
+        c = self.exploration
+        best = None
+        best_score = -INF
+        for child in node.children.values():
+            score = child.wins / child.visits + c * math.sqrt(log_n / child.visits)
+            if score > best_score:
+                best_score = score
+                best = child
+        return best
+
+    def _rollout(self, player: int) -> int | None:
+        """
+        Mô phỏng ngẫu nhiên từ thế hiện tại, player đi trước; trả về bên thắng (None = hòa).
+        Mỗi nước: thắng ngay nếu được, chặn nước thắng của đối thủ, còn lại chọn ngẫu nhiên trong ô gần quân.
+        Bàn cờ được trả về nguyên trạng.
+        """
+        board = self.board
+        rng = self.rng
+        played = 0
+        limit = self.rollout_limit
+        while not board.game_over() and (limit is None or played < limit):
+            forced = self._forced_moves(player)
+            if forced:
+                row, col = forced[0] if len(forced) == 1 else rng.choice(forced)
+            elif board.candidates:
+                row, col = rng.choice(tuple(board.candidates))
+            else:
+                row, col = rng.choice(board.generate_moves())
+            board.place_move(row, col, player)
+            played += 1
+            player = -player
+        winner = board.winner
+        for _ in range(played):
+            board.undo_move()
+        self.nodes += played
+        return winner
+
+    def _iterate(self, root: MCTSNode) -> int:
+        #1 vòng: chọn -> mở rộng -> mô phỏng theo lô -> lan truyền. Trả về độ sâu nút lá
+        board = self.board
+        node = root
+        depth = 0
+        while not node.untried and node.children:
+            node = self._select_child(node)
+            board.place_move(node.move[0], node.move[1], node.player)
+            depth += 1
+
+        if node.untried:
+            row, col = node.untried.pop()
+            player = -node.player
+            board.place_move(row, col, player)
+            depth += 1
+            child = self._new_node((row, col), player, node)
+            node.children[(row, col)] = child
+            node = child
+            self.nodes += 1
+
+        #Chạy rollout_batch ván từ cùng một nút rồi lan truyền 1 lần
+        if board.game_over():
+            batch = 1
+            results = [board.winner]
+        else:
+            batch = self.rollout_batch
+            results = [self._rollout(-node.player) for _ in range(batch)]
+        self.rollouts += batch
+
+        while node is not None:
+            score = 0.0
+            for winner in results:
+                if winner == node.player:
+                    score += 1.0
+                elif winner is None:
+                    score += 0.5
+            node.visits += batch
+            node.wins += score
+            if node is not root:
+                board.undo_move()
+            node = node.parent
+        return depth
+
+    def _best_child(self, root: MCTSNode) -> MCTSNode:
+        #Nước được thăm nhiều nhất (ổn định hơn chọn theo tỉ lệ thắng)
+        return max(root.children.values(), key=lambda child: (child.visits, child.wins))
+
+    def pruning_stats(self) -> dict:
+        #Thống kê lượt tìm kiếm gần nhất (cùng tên khóa với AIPlayer khi có ý nghĩa)
+        return {
+            "size": self.board.get_size(),
+            "depth": self.completed_depth,
+            "nodes": self.nodes,
+            "iterations": self.iterations_done,
+            "rollouts": self.rollouts,
+            "reused_visits": self.reused_visits,
+            "win_rate": self.best_value / 100,
+            "time": self.search_time,
+            "nodes_per_second": self.nodes / self.search_time if self.search_time else 0.0,
+        }
+
+    def close(self):
+        #Bỏ cây đã lưu
+        self._root = None
+        self._root_moves = []
+
+    def find_best_move(self):
+        #Tìm nước đi tốt nhất cho AI bằng UCT trong giới hạn thời gian / số vòng
+        start = time.perf_counter()
+        self.nodes = 0
+        self.iterations_done = 0
+        self.rollouts = 0
+        self.completed_depth = 0
+        board = self.board
+
+        moves = board.generate_moves()
+        if not moves or board.game_over():
+            self.search_time = 0.0
+            return None
+        #Thắng ngay thì không cần tìm
+        wins = board.winning_cells(self.ai_player)
+        if wins:
+            self.best_value = 100
+            self.search_time = time.perf_counter() - start
+            return min(wins)
+
+        root = self._reuse_root()
+        self._root = root
+        self.reused_visits = root.visits
+        deadline = start + self.time_limit if self.time_limit is not None else None
+        next_report = start + 0.25
+        history_len = len(board.history)
+        try:
+            while self.iterations is None or self.iterations_done < self.iterations:
+                if self.stop_event is not None and self.stop_event.is_set():
+                    break
+                now = time.perf_counter()
+                if deadline is not None and now >= deadline:
+                    break
+                depth = self._iterate(root)
+                self.iterations_done += 1
+                if depth > self.completed_depth:
+                    self.completed_depth = depth
+                if self.on_progress is not None and now >= next_report:
+                    next_report = now + 0.25
+                    best = self._best_child(root)
+                    self.on_progress(self.completed_depth, best.move, round(100 * best.wins / best.visits))
+        finally:
+            while len(board.history) > history_len:
+                board.undo_move()
+
+        self.search_time = time.perf_counter() - start
+        if not root.children:
+            return moves[0]
+        best = self._best_child(root)
+        self.best_value = round(100 * best.wins / best.visits)
+        return best.move
+
+
+#CLASS TÌM KIẾM NỀN
+class SearchWorker:
+    """
+    Chạy tìm kiếm của AI trong luồng nền để cửa sổ không bị treo.
+    - Tìm trên bản sao bàn cờ nên bàn cờ của giao diện không bị đụng tới
+    - Gửi tiến độ/kết quả qua hàng đợi, giao diện tự lấy ra bằng root.after
+    - cancel(): dừng sớm, kết quả là vòng sâu dần hoàn tất gần nhất
+    predict=True: chế độ ponder - trước hết đoán nước của người (tìm với vai trò đảo ngược),
+    đánh thử nước đó rồi tìm nước đáp trả của AI.
+    """
+
+    def __init__(self, ai: "AIPlayer | MCTSPlayer", board: Board, time_limit: float, predict: bool = False):
+        self.ai = ai
+        self.board = board.copy()
+        self.time_limit = time_limit
+        self.predict = predict
+        self.predicted_move = None
+        self.result = None
+        #True khi result dùng được: đã xong ít nhất 1 vòng tìm, hoặc nước lấy từ bảng tính sẵn/ThreatSolver
+        self.result_ready = False
+        self.started_at = None
+        self.stop_event = threading.Event()
+        self.messages = queue.Queue()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self.thread.start()
+
+    def cancel(self):
+        self.stop_event.set()
+
+    def join(self):
+        self.thread.join()
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started_at
+
+    def _run(self):
+        ai = self.ai
+        if self.predict:
+            predictor = AIPlayer(self.board, ai_player=ai.human_player, human_player=ai.ai_player,
+                                 tt_size=0, time_limit=PREDICT_TIME_LIMIT)
+            predictor.stop_event = self.stop_event
+            self.predicted_move = predictor.find_best_move()
+            if self.predicted_move is None or self.stop_event.is_set():
+                self.messages.put(("done", None))
+                return
+            self.board.place_move(self.predicted_move[0], self.predicted_move[1], ai.human_player)
+            if self.board.game_over():
+                self.messages.put(("done", None))
+                return
+
+        ai.board = self.board
+        ai.time_limit = self.time_limit
+        ai.stop_event = self.stop_event
+        ai.on_progress = lambda depth, move, value: self.messages.put(("progress", depth, move, value))
+        try:
+            self.result = ai.find_best_move()
+            self.result_ready = ai.completed_depth > 0 or (
+                isinstance(ai, AIPlayer) and (ai.book_hit or ai.threat_hit))
+        finally:
+            ai.stop_event = None
+            ai.on_progress = None
+        self.messages.put(("done", self.result))
+
+
+#CLASS VẼ BÀN CỜ
+class BoardCanvas:
+    """
+    Vẽ bàn cờ trên 1 Canvas duy nhất thay cho lưới size x size nút bấm:
+    - reset(): xóa và vẽ lại lưới (2 * (size + 1) đường kẻ) khi tạo ván mới
+    - draw_stone(): mỗi nước chỉ thêm 1 chữ X/O và dời khung đánh dấu nước vừa đi
+    - on_click(row, col) được gọi khi bấm vào 1 ô
+    """
+
+    #Màu quân theo người chơi
+    COLORS = {HUMAN: "#1f4fd1", AI: "#d12f1f"}
+
+    def __init__(self, parent, on_click):
+        self.on_click = on_click
+        self.size = 0
+        self.cell = 0
+        self.canvas = tk.Canvas(parent, bg="#f2d9a6", highlightthickness=0)
+        self.canvas.pack()
+        self.canvas.bind("<Button-1>", self._handle_click)
+
+    @staticmethod
+    def cell_size_for(size: int) -> int:
+        #Tự scale kích thước ô theo size bàn cờ (bàn càng lớn ô càng nhỏ)
+        return max(24, min(80, 600 // size))
+
+    def reset(self, size: int):
+        self.size = size
+        self.cell = self.cell_size_for(size)
+        length = size * self.cell
+        canvas = self.canvas
+        canvas.delete("all")
+        canvas.config(width=length + 1, height=length + 1)
+        for i in range(size + 1):
+            pos = i * self.cell
+            canvas.create_line(pos, 0, pos, length, fill="#7a5c2e")
+            canvas.create_line(0, pos, length, pos, fill="#7a5c2e")
+        #Khung đánh dấu nước vừa đi: tạo 1 lần, mỗi nước chỉ dời tọa độ
+        self.last_marker = canvas.create_rectangle(0, 0, 0, 0, outline="#2e9c3f", width=2, state="hidden")
+
+    def draw_stone(self, row: int, col: int, player: int):
+        cell = self.cell
+        x = col * cell + cell // 2
+        y = row * cell + cell // 2
+        self.canvas.create_text(x, y, text="X" if player == HUMAN else "O",
+                                fill=self.COLORS[player], font=("Arial", max(8, cell // 2), "bold"))
+        self.canvas.coords(self.last_marker, col * cell + 2, row * cell + 2,
+                           (col + 1) * cell - 2, (row + 1) * cell - 2)
+        self.canvas.itemconfig(self.last_marker, state="normal")
+
+    def _handle_click(self, event):
+        row = event.y // self.cell
+        col = event.x // self.cell
+        if 0 <= row < self.size and 0 <= col < self.size:
+            self.on_click(row, col)
+
 
 #  CLASS GIAO DIỆN
 class CaroGUI:
@@ -193,7 +2094,12 @@ class CaroGUI:
         size_frame.pack(pady=5)
 
         tk.Label(size_frame, text="Board size:").pack(side=tk.LEFT, padx=5)
-        tk.OptionMenu(size_frame, self.size_var, "3x3", "5x5", "10x10").pack(side=tk.LEFT)
+        tk.OptionMenu(size_frame, self.size_var, *(f"{n}x{n}" for n in BOARD_SIZES)).pack(side=tk.LEFT)
+
+        #Chọn engine AI (áp dụng khi bấm New Game)
+        self.engine_var = tk.StringVar(value="Minimax")
+        tk.Label(size_frame, text="AI:").pack(side=tk.LEFT, padx=5)
+        tk.OptionMenu(size_frame, self.engine_var, "Minimax", "MCTS").pack(side=tk.LEFT)
 
         tk.Button(size_frame, text="New Game", command=self.new_game).pack(side=tk.LEFT, padx=10)
 
@@ -201,88 +2107,62 @@ class CaroGUI:
         self.status_label = tk.Label(root, text="Chọn New Game để bắt đầu", fg="blue")
         self.status_label.pack(pady=5)
 
-        #Frame chứa bàn cờ
+        #Frame chứa bàn cờ (1 Canvas, tạo 1 lần và dùng lại cho mọi ván)
         self.board_frame = tk.Frame(root)
         self.board_frame.pack(pady=10)
+        self.board_view = BoardCanvas(self.board_frame, self.handle_click)
 
         #Thuộc tính game
         self.board: Board | None = None
-        self.ai_player: AIPlayer | None = None
-        self.buttons = []
+        self.ai_player: AIPlayer | MCTSPlayer | None = None
         self.human_turn = True
+        #Luồng tìm kiếm nền đang chạy (tìm nước thật hoặc ponder)
+        self.worker: SearchWorker | None = None
+        #Bảng nước đi tính sẵn theo (size, win_length), chỉ nạp 1 lần
+        self.books = {}
 
         #Khởi tạo game lần đầu
         self.new_game()
 
     def _create_board_and_ai(self):
         #Tạo lại Board 
-        choice = self.size_var.get()
-        if choice == "3x3":
-            size = 3
-            win_length = 3
-        elif choice == "5x5":
-            size = 5
-            win_length = 5
-        else:
-            size = 10
-            win_length = 5
+        size = int(self.size_var.get().split("x")[0])
+        #3x3: 3 quân liên tiếp để thắng, các bàn khác: 5 quân
+        win_length = 3 if size == 3 else 5
 
-        self.board = Board(size, win_length)
-        self.ai_player = AIPlayer(self.board)
-
-    def _get_button_style_for_size(self, size: int):
-        
-        #Tự scale kích thước nút + font theo size bàn cờ.
-        if size == 3:
-            return 3, 1, 20  
-        elif size == 5:
-            return 2, 1, 16 
-        else:  
-            return 2, 1, 12 
+        self._stop_worker()
+        if self.ai_player is not None:
+            self.ai_player.close()
+        self.board = new_board(size, win_length)
+        if (size, win_length) not in self.books:
+            self.books[(size, win_length)] = OpeningBook.load_default(size, win_length)
+        if self.engine_var.get() == "MCTS":
+            self.ai_player = MCTSPlayer(self.board, time_limit=AI_TIME_LIMIT)
+        else:
+            #Bàn nhỏ ít nước con ở nút sát lá, chấm bằng NumPy không lợi hơn
+            self.ai_player = AIPlayer(self.board, time_limit=AI_TIME_LIMIT, workers=AI_WORKERS,
+                                      book=self.books[(size, win_length)],
+                                      batch_eval=np is not None and size >= 10)
 
     def new_game(self):
-        """Reset game: tạo lại Board, AI và lưới button."""
-        #Xóa các nút cũ
-        for widget in self.board_frame.winfo_children():
-            widget.destroy()
-
-        #Tạo lại 
+        """Reset game: tạo lại Board, AI và vẽ lại lưới trên Canvas."""
         self._create_board_and_ai()
-        size = self.board.get_size()
+        self.board_view.reset(self.board.get_size())
 
-        self.buttons = []
         self.human_turn = True
         self.status_label.config(text="Lượt bạn (X)")
 
-        btn_width, btn_height, font_size = self._get_button_style_for_size(size)
-
-        #Tạo lưới button mới
-        for row in range(size):
-            row_buttons = []
-            for col in range(size):
-                btn = tk.Button(
-                    self.board_frame,
-                    text=" ",
-                    width=btn_width,
-                    height=btn_height,
-                    font=("Arial", font_size),
-                    command=lambda r=row, c=col: self.handle_click(r, c)
-                )
-                btn.grid(row=row, column=col, padx=1, pady=1)
-                row_buttons.append(btn)
-            self.buttons.append(row_buttons)
-
     def handle_click(self, row: int, col: int):
         #Xử lý khi người chơi click vào ô 
         if not self.human_turn:
             return
 
-        if self.board.grid[row][col] != EMPTY:
+        if self.board.get_cell(row, col) != EMPTY:
             return
 
         #X
         self.board.place_move(row, col, HUMAN)
-        self.buttons[row][col].config(text="X", state="disabled")
+        self.board_view.draw_stone(row, col, HUMAN)
 
         if self.board.game_over():
             self.show_result()
@@ -290,12 +2170,65 @@ class CaroGUI:
 
         self.human_turn = False
         self.status_label.config(text="Lượt AI (O)...")
-        # Cho AI đánh sau 100ms để UI kịp cập nhật
-        self.root.after(100, self.ai_move)
 
-    def ai_move(self):
-        #Lượt AI: tìm nước đi tốt nhất và đánh
-        best_move = self.ai_player.find_best_move()
+        worker = self.worker
+        if worker is not None and worker.predict:
+            if worker.predicted_move == (row, col) and not worker.stop_event.is_set():
+                #Đoán trúng: dùng luôn kết quả ponder, chỉ chờ thêm nếu chưa nghĩ đủ AI_TIME_LIMIT
+                remaining = AI_TIME_LIMIT - worker.elapsed()
+                if remaining > 0:
+                    self.root.after(int(remaining * 1000), worker.cancel)
+                else:
+                    worker.cancel()
+                self.status_label.config(text="Lượt AI (O)... (đoán trúng nước đi)")
+                self.root.after(20, self._poll_worker, worker)
+                return
+            self._stop_worker()
+
+        self.worker = SearchWorker(self.ai_player, self.board, AI_TIME_LIMIT)
+        self.worker.start()
+        self.root.after(20, self._poll_worker, self.worker)
+
+    def _stop_worker(self):
+        #Hủy luồng nền hiện tại (nếu có) và chờ nó thoát
+        if self.worker is not None:
+            self.worker.cancel()
+            self.worker.join()
+            self.worker = None
+
+    def _start_ponder(self):
+        #Suy nghĩ trước trong lượt của người
+        self.worker = SearchWorker(self.ai_player, self.board, PONDER_TIME_LIMIT, predict=True)
+        self.worker.start()
+
+    def _poll_worker(self, worker: SearchWorker):
+        #Lấy tiến độ/kết quả từ luồng nền; bỏ qua luồng đã bị thay (new game)
+        if worker is not self.worker:
+            return
+        while True:
+            try:
+                message = worker.messages.get_nowait()
+            except queue.Empty:
+                break
+            if message[0] == "progress":
+                _, depth, move, value = message
+                self.status_label.config(
+                    text=f"Lượt AI (O)... độ sâu {depth}, nước tốt nhất {move}, điểm {value}")
+            else:
+                worker.join()
+                self.worker = None
+                if worker.predict and not worker.result_ready:
+                    #Ponder bị dừng trước khi xong vòng đầu tiên -> tìm lại bình thường
+                    self.worker = SearchWorker(self.ai_player, self.board, AI_TIME_LIMIT)
+                    self.worker.start()
+                    self.root.after(20, self._poll_worker, self.worker)
+                    return
+                self.ai_move(message[1])
+                return
+        self.root.after(20, self._poll_worker, worker)
+
+    def ai_move(self, best_move):
+        #Lượt AI: đánh nước tốt nhất tìm được ở luồng nền
         if best_move is None:
             # Không còn nước đi
             self.show_result()
@@ -303,17 +2236,22 @@ class CaroGUI:
 
         row, col = best_move
         self.board.place_move(row, col, AI)
-        self.buttons[row][col].config(text="O", state="disabled")
+        self.board_view.draw_stone(row, col, AI)
 
         if self.board.game_over():
             self.show_result()
             return
 
         self.human_turn = True
-        self.status_label.config(text="Lượt bạn (X)")
+        #Tóm tắt lượt tìm vừa xong lên dòng trạng thái (chi tiết hơn: --benchmark --trace)
+        stats = self.ai_player.pruning_stats()
+        self.status_label.config(
+            text=f"Lượt bạn (X) - AI: độ sâu {stats['depth']}, {stats['nodes']} nút, {stats['time']:.2f}s")
+        self._start_ponder()
 
     def show_result(self):
         #Hiển thị kết quả 
+        self._stop_worker()
         winner = self.board.check_winner()
         if winner == HUMAN:
             msg = "Bạn thắng!"
@@ -324,15 +2262,416 @@ class CaroGUI:
 
         self.status_label.config(text=msg)
 
-        # Khóa hết các ô lại
-        for row_buttons in self.buttons:
-            for btn in row_buttons:
-                btn.config(state="disabled")
+        # Khóa bàn cờ: bỏ qua mọi cú click tới khi bấm New Game
+        self.human_turn = False
 
         messagebox.showinfo("Kết quả", msg)
 
+#BENCHMARK KHÔNG GIAO DIỆN
+#Thế cờ kiểm tra theo kích thước: (tên, các nước đã đánh (row, col, player), tập nước đúng cho bên đi tiếp)
+#Bên đi tiếp luôn là AI (O) vì số quân 2 bên bằng nhau
+BENCH_POSITIONS = {
+    3: [
+        ("win-in-1", [(0, 0, HUMAN), (1, 0, AI), (0, 1, HUMAN), (1, 1, AI), (2, 2, HUMAN)], {(1, 2)}),
+        ("block", [(0, 0, HUMAN), (1, 1, AI), (0, 1, HUMAN)], {(0, 2)}),
+    ],
+    5: [
+        ("win-four", [(4, 0, HUMAN), (0, 0, AI), (4, 1, HUMAN), (0, 1, AI), (4, 2, HUMAN), (0, 2, AI),
+                      (4, 3, HUMAN), (0, 3, AI), (2, 2, HUMAN)], {(0, 4)}),
+        ("block-four", [(2, 0, HUMAN), (0, 0, AI), (2, 1, HUMAN), (0, 1, AI), (2, 2, HUMAN), (0, 2, AI),
+                        (2, 3, HUMAN)], {(2, 4)}),
+    ],
+    10: [
+        ("win-broken-four", [(7, 7, HUMAN), (4, 2, AI), (7, 8, HUMAN), (4, 3, AI), (1, 1, HUMAN), (4, 5, AI),
+                             (8, 2, HUMAN), (4, 6, AI)], {(4, 4)}),
+        ("block-broken-four", [(5, 2, HUMAN), (1, 1, AI), (5, 3, HUMAN), (8, 8, AI), (5, 5, HUMAN), (1, 8, AI),
+                               (5, 6, HUMAN)], {(5, 4)}),
+        ("block-open-three", [(5, 3, HUMAN), (8, 1, AI), (5, 4, HUMAN), (8, 8, AI), (5, 5, HUMAN)],
+         {(5, 2), (5, 6)}),
+    ],
+}
+
+#Engine dùng trong benchmark: tên -> hàm tạo (board, player, time_limit, seed)
+#Minimax không dùng bảng khai cuộc để đo đúng tốc độ tìm kiếm
+BENCH_ENGINES = {
+    "minimax": lambda board, player, time_limit, seed: AIPlayer(
+        board, ai_player=player, human_player=-player, time_limit=time_limit),
+    "mcts": lambda board, player, time_limit, seed: MCTSPlayer(
+        board, ai_player=player, human_player=-player, time_limit=time_limit, seed=seed),
+}
+if np is not None:
+    BENCH_ENGINES["minimax-numpy"] = lambda board, player, time_limit, seed: AIPlayer(
+        board, ai_player=player, human_player=-player, time_limit=time_limit, batch_eval=True)
+
+
+def _bench_board(size: int) -> Board:
+    return new_board(size, 3 if size == 3 else 5)
+
+
+class BenchStats:
+    """Cộng dồn số liệu các nước đi của 1 engine trên 1 kích thước bàn."""
+
+    def __init__(self):
+        self.moves = 0
+        self.time = 0.0
+        self.max_time = 0.0
+        self.nodes = 0
+        self.depth = 0
+        self.interior_nodes = 0
+        self.cutoffs = 0
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.tt_cutoffs = 0
+        self.games = 0
+        self.wins = 0
+        self.draws = 0
+        self.losses = 0
+
+    def add_move(self, elapsed: float, stats: dict):
+        self.moves += 1
+        self.time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+        self.nodes += stats["nodes"]
+        self.depth += stats["depth"]
+        self.interior_nodes += stats.get("interior_nodes", 0)
+        self.cutoffs += stats.get("cutoffs", 0)
+        self.tt_probes += stats.get("tt_probes", 0)
+        self.tt_hits += stats.get("tt_hits", 0)
+        self.tt_cutoffs += stats.get("tt_cutoffs", 0)
+
+    def add_result(self, score: float):
+        self.games += 1
+        if score == 1:
+            self.wins += 1
+        elif score == 0:
+            self.losses += 1
+        else:
+            self.draws += 1
+
+    def to_dict(self) -> dict:
+        return {
+            "moves": self.moves,
+            "nodes": self.nodes,
+            "nodes_per_second": self.nodes / self.time if self.time else 0.0,
+            "time_per_move": self.time / self.moves if self.moves else 0.0,
+            "max_time_per_move": self.max_time,
+            "depth": self.depth / self.moves if self.moves else 0.0,
+            #Tỉ lệ nút trong bị cắt tỉa (None với engine không dùng alpha-beta)
+            "pruning_ratio": self.cutoffs / self.interior_nodes if self.interior_nodes else None,
+            #Tỉ lệ trúng / cắt nhánh nhờ bảng chuyển vị (None khi engine không tra bảng)
+            "tt_hit_rate": self.tt_hits / self.tt_probes if self.tt_probes else None,
+            "tt_cutoff_rate": self.tt_cutoffs / self.tt_probes if self.tt_probes else None,
+            "games": self.games,
+            "wins": self.wins,
+            "draws": self.draws,
+            "losses": self.losses,
+            "win_rate": self.wins / self.games if self.games else 0.0,
+            "draw_rate": self.draws / self.games if self.games else 0.0,
+        }
+
+
+def bench_positions(engine: str, size: int, time_limit: float, stats: BenchStats, trace: bool = False):
+    #Giải các thế cờ kiểm tra; trả về danh sách kết quả từng thế (kèm SearchStats nếu trace)
+    results = []
+    for name, moves, expected in BENCH_POSITIONS.get(size, []):
+        board = _bench_board(size)
+        for row, col, player in moves:
+            board.place_move(row, col, player)
+        ai = BENCH_ENGINES[engine](board, AI, time_limit, 0)
+        if trace and isinstance(ai, AIPlayer):
+            ai.trace = SearchStats()
+        start = time.perf_counter()
+        move = ai.find_best_move()
+        elapsed = time.perf_counter() - start
+        info = ai.pruning_stats()
+        ai.close()
+        stats.add_move(elapsed, info)
+        result = {
+            "engine": engine,
+            "size": size,
+            "position": name,
+            "move": list(move) if move is not None else None,
+            "expected": sorted(list(m) for m in expected),
+            "solved": move in expected,
+            "time": elapsed,
+            "depth": info["depth"],
+            "nodes": info["nodes"],
+        }
+        if getattr(ai, "trace", None) is not None:
+            result["trace"] = ai.trace.to_dict()
+        results.append(result)
+    return results
+
+
+def bench_game(x_engine: str, o_engine: str, size: int, time_limit: float, random_plies: int,
+               rng: random.Random, stats: dict):
+    """
+    1 ván AI đấu AI trên bàn mới: random_plies nước đầu chọn ngẫu nhiên (để các ván khác nhau),
+    sau đó X (HUMAN) và O (AI) lần lượt dùng engine của mình. stats[(engine, size)] được cộng dồn.
+    """
+    board = _bench_board(size)
+    seed = rng.randrange(1 << 30)
+    players = {
+        HUMAN: (x_engine, BENCH_ENGINES[x_engine](board, HUMAN, time_limit, seed)),
+        AI: (o_engine, BENCH_ENGINES[o_engine](board, AI, time_limit, seed + 1)),
+    }
+    opening = []
+    player = HUMAN
+    try:
+        while not board.game_over():
+            if len(opening) < random_plies:
+                row, col = rng.choice(board.generate_moves())
+                opening.append([row, col])
+            else:
+                engine, ai = players[player]
+                start = time.perf_counter()
+                row, col = ai.find_best_move()
+                stats[(engine, size)].add_move(time.perf_counter() - start, ai.pruning_stats())
+            board.place_move(row, col, player)
+            player = -player
+    finally:
+        for _, ai in players.values():
+            ai.close()
+
+    winner = board.check_winner()
+    for side, (engine, _) in players.items():
+        stats[(engine, size)].add_result(0.5 if winner is None else float(winner == side))
+    return {
+        "size": size,
+        "x": x_engine,
+        "o": o_engine,
+        "opening": opening,
+        "winner": "draw" if winner is None else ("x" if winner == HUMAN else "o"),
+        "moves": board.stone_count,
+    }
+
+
+def benchmark_main(args):
+    """
+    Chạy benchmark không cần giao diện và ghi kết quả dạng JSON:
+    - positions: từng thế cờ kiểm tra (nước chọn, đúng/sai, thời gian, độ sâu, số nút)
+    - games: từng ván tự đấu
+    - summary[engine][size]: nodes/s, thời gian mỗi nước, độ sâu, tỉ lệ cắt tỉa, tỉ lệ thắng/hòa
+    """
+    engines = args.engines.split(",")
+    for engine in engines:
+        if engine not in BENCH_ENGINES:
+            raise SystemExit(f"Engine không hợp lệ: {engine} (chọn trong {', '.join(BENCH_ENGINES)})")
+    sizes = [int(s) for s in args.sizes.split(",")]
+    rng = random.Random(args.seed)
+    stats = {(engine, size): BenchStats() for engine in engines for size in sizes}
+    position_results = []
+    games = []
+    start = time.perf_counter()
+
+    for size in sizes:
+        for engine in engines:
+            position_results += bench_positions(engine, size, args.time, stats[(engine, size)], args.trace)
+        #Mọi cặp engine (kể cả tự đấu), mỗi cặp đổi bên cầm X
+        for x_engine in engines:
+            for o_engine in engines:
+                for _ in range(args.games):
+                    game = bench_game(x_engine, o_engine, size, args.time, args.random_plies, rng, stats)
+                    games.append(game)
+                    print(f"{size}x{size} {x_engine} (X) - {o_engine} (O): {game['winner']} "
+                          f"sau {game['moves']} nước", file=sys.stderr)
+
+    report = {
+        "label": args.label,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "engines": engines,
+            "sizes": sizes,
+            "time_limit": args.time,
+            "games": args.games,
+            "random_plies": args.random_plies,
+            "seed": args.seed,
+        },
+        "elapsed": time.perf_counter() - start,
+        "positions": position_results,
+        "games": games,
+        "summary": {
+            engine: {str(size): stats[(engine, size)].to_dict() for size in sizes}
+            for engine in engines
+        },
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+#PHÂN TÍCH VÁN CỜ HÀNG LOẠT
+def _read_records(stream, per_move: bool):
+    """
+    Đọc lần lượt từng dòng (không nạp cả file), mỗi dòng 1 đối tượng JSON:
+        {"size": 10, "win_length": 5, "moves": [[4, 4], [4, 5], ...]}
+    X (HUMAN) đi trước, 2 bên đánh xen kẽ. win_length mặc định 3 cho 3x3, 5 cho bàn khác;
+    cần size >= 1 và 1 <= win_length <= size.
+    Sinh ra (số dòng, số nước, size, win_length, moves) cho thế cuối ván,
+    hoặc cho mọi thế trong ván nếu per_move.
+    """
+    for line_no, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        try:
+            record = json.loads(line)
+            size = int(record["size"])
+            win_length = record.get("win_length")
+            win_length = int(win_length) if win_length is not None else (3 if size == 3 else 5)
+            moves = [(int(row), int(col)) for row, col in record.get("moves", [])]
+            #Kích thước sai sẽ làm hỏng việc dựng bàn ở tiến trình con -> báo lỗi như JSON sai
+            if size < 1:
+                raise ValueError(f"size phải >= 1: {size}")
+            if not 1 <= win_length <= size:
+                raise ValueError(f"win_length phải trong khoảng 1..{size}: {win_length}")
+        except (ValueError, KeyError, TypeError) as e:
+            yield line_no, None, f"dòng không hợp lệ: {e}"
+            continue
+        plies = range(len(moves) + 1) if per_move else (len(moves),)
+        for ply in plies:
+            yield line_no, ply, (size, win_length, moves[:ply])
+
+
+def _analyze_position(task):
+    """
+    Chạy trong tiến trình con: dựng thế cờ, cho engine tìm nước cho bên đi tiếp.
+    Trả về dict kết quả (điểm tính theo phía bên đi tiếp).
+    """
+    line_no, ply, (size, win_length, moves), engine, depth, time_limit = task
+    result = {"line": line_no, "ply": ply}
+    board = new_board(size, win_length)
+    player = HUMAN
+    for row, col in moves:
+        if not board.in_bounds(row, col) or board.get_cell(row, col) != EMPTY or board.game_over():
+            result["error"] = f"nước không hợp lệ: {[row, col]}"
+            return result
+        board.place_move(row, col, player)
+        player = -player
+
+    result["to_move"] = "x" if player == HUMAN else "o"
+    if board.game_over():
+        winner = board.check_winner()
+        result["winner"] = "draw" if winner is None else ("x" if winner == HUMAN else "o")
+        return result
+
+    if engine == "mcts":
+        ai = MCTSPlayer(board, ai_player=player, human_player=-player, time_limit=time_limit, seed=0)
+    else:
+        ai = AIPlayer(board, ai_player=player, human_player=-player, max_depth=depth,
+                      batch_eval=engine == "minimax-numpy")
+    move = ai.find_best_move()
+    stats = ai.pruning_stats()
+    result["move"] = list(move) if move is not None else None
+    result["score"] = ai.best_value
+    result["pv"] = [list(m) for m in stats.pop("pv", [move])]
+    result["stats"] = stats
+    return result
+
+
+def analyze_main(args):
+    """
+    Phân tích hàng loạt: đọc thế cờ/ván cờ từ file (hoặc stdin nếu '-'), chia cho nhiều tiến trình,
+    ghi kết quả ra từng dòng JSON theo đúng thứ tự đầu vào.
+    Chỉ giữ tối đa 2 * jobs thế cờ đang chờ nên bộ nhớ không phụ thuộc độ lớn file.
+    """
+    if args.engine not in ("minimax", "minimax-numpy", "mcts"):
+        raise SystemExit(f"Engine không hợp lệ: {args.engine}")
+    if args.engine == "minimax-numpy" and np is None:
+        raise SystemExit("Engine minimax-numpy cần numpy (pip install numpy)")
+    jobs = args.jobs or os.cpu_count() or 1
+    source = sys.stdin if args.analyze == "-" else open(args.analyze, encoding="utf-8")
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    pending = collections.deque()
+
+    def write(result):
+        output.write(json.dumps(result, ensure_ascii=False) + "\n")
+        output.flush()
+
+    try:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            for line_no, ply, position in _read_records(source, args.per_move):
+                if ply is None:
+                    pending.append({"line": line_no, "error": position})
+                else:
+                    task = (line_no, ply, position, args.engine, args.depth, args.time)
+                    pending.append(executor.submit(_analyze_position, task))
+                #Ghi ngay các kết quả đầu hàng đợi; đủ 2 * jobs việc đang chạy thì chờ việc cũ nhất
+                while pending and (len(pending) >= 2 * jobs or isinstance(pending[0], dict)
+                                   or pending[0].done()):
+                    item = pending.popleft()
+                    write(item if isinstance(item, dict) else item.result())
+            while pending:
+                item = pending.popleft()
+                write(item if isinstance(item, dict) else item.result())
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+
+
 #  HÀM MAIN
-if __name__ == "__main__":
+def build_book_main(args):
+    #Tạo bảng nước đi tính sẵn và lưu ra file
+    size = args.build_book
+    win_length = args.win_length or (3 if size == 3 else 5)
+    start = time.perf_counter()
+    if size == 3:
+        book = OpeningBook.solve(size, win_length)
+    else:
+        book = OpeningBook.build(size, win_length, args.plies, depth=args.depth)
+    path = args.output or OpeningBook.default_path(size)
+    book.save(path)
+    print(f"Đã lưu {len(book)} thế cờ vào {path} ({time.perf_counter() - start:.1f}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Caro AI - Minimax + Alpha-Beta")
+    parser.add_argument("--build-book", type=int, metavar="SIZE",
+                        help="tạo bảng nước đi tính sẵn cho bàn SIZE x SIZE (3 = giải toàn bộ)")
+    parser.add_argument("--win-length", type=int, help="số quân liên tiếp để thắng (mặc định 3 cho 3x3, 5 cho bàn khác)")
+    parser.add_argument("--plies", type=int, default=2, help="số nước đầu đưa vào khai cuộc (bàn > 3x3)")
+    parser.add_argument("--depth", type=int, default=3, help="độ sâu tìm kiếm khi tạo khai cuộc hoặc phân tích (Minimax)")
+    parser.add_argument("--output", help="đường dẫn file bảng (mặc định caro_book_NxN.json cạnh chương trình) "
+                                         "hoặc file kết quả benchmark/phân tích (mặc định in ra màn hình)")
+    parser.add_argument("--benchmark", action="store_true", help="chạy benchmark AI đấu AI không cần giao diện")
+    parser.add_argument("--engines", default="minimax,mcts", help="các engine benchmark, cách nhau dấu phẩy")
+    parser.add_argument("--sizes", default="3,5,10", help="các kích thước bàn benchmark")
+    parser.add_argument("--games", type=int, default=2, help="số ván cho mỗi cặp engine (X, O)")
+    parser.add_argument("--time", type=float, default=0.2,
+                        help="thời gian suy nghĩ mỗi nước khi benchmark hoặc phân tích bằng MCTS (giây)")
+    parser.add_argument("--random-plies", type=int, default=1, help="số nước mở đầu ngẫu nhiên mỗi ván benchmark")
+    parser.add_argument("--seed", type=int, default=0, help="hạt giống ngẫu nhiên của benchmark")
+    parser.add_argument("--label", help="nhãn ghi vào kết quả benchmark (vd: tên phiên bản)")
+    parser.add_argument("--trace", action="store_true",
+                        help="ghi số liệu chi tiết (SearchStats) của Minimax cho từng thế cờ kiểm tra")
+    parser.add_argument("--analyze", metavar="FILE",
+                        help="phân tích các ván cờ trong FILE (mỗi dòng 1 JSON, '-' = stdin), kết quả là JSON từng dòng")
+    parser.add_argument("--engine", default="minimax", help="engine phân tích: minimax, minimax-numpy hoặc mcts")
+    parser.add_argument("--jobs", type=int, help="số tiến trình phân tích (mặc định = số CPU)")
+    parser.add_argument("--per-move", action="store_true", help="phân tích mọi thế cờ trong ván, không chỉ thế cuối")
+    args = parser.parse_args()
+
+    if args.build_book:
+        build_book_main(args)
+        return
+    if args.benchmark:
+        benchmark_main(args)
+        return
+    if args.analyze:
+        analyze_main(args)
+        return
+
     root = tk.Tk()
     app = CaroGUI(root)
     root.mainloop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,25 @@
-import tkinter as tk
+import argparse
 import heapq
+import mmap
+import os
+import time
+import tkinter as tk
+from array import array
+from collections import OrderedDict
 from dataclasses import dataclass
-from typing import Dict, List, Optional, Tuple, Set
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Set
 
 
 Pos = Tuple[int, int]  # Tọa độ ô trong lưới: (row, col)
 
+WALL = ord("#")  # Mã byte của ô tường trong GridMap.cells
+INF = float("inf")
+
+
+def int_buffer(n: int, fill: int = -1) -> array:
+    #Mảng n số nguyên 4 byte cùng giá trị fill (g/came_from theo chỉ số ô, không tạo object cho từng ô)
+    return array("i", [fill]) * n
+
 
 
 # 1) HÀM CHUẨN HÓA MAP
@@ -39,6 +53,29 @@ def normalize_map(lines: List[str]) -> List[str]:
     return normalized
 
 
+def _pad_row(line: bytes, target: int) -> bytes:
+    #Chuẩn hóa 1 dòng (dạng bytes) giống normalize_map, dùng khi đọc map từ file
+    if len(line) >= target:
+        return line
+    if line.startswith(b"#") and line.endswith(b"#") and len(line) >= 2:
+        return b"#" + line[1:-1].ljust(target - 2, b".") + b"#"
+    return line.ljust(target, b".")
+
+
+def _iter_map_lines(path: str, use_mmap: bool = False) -> Iterator[bytes]:
+    #Đọc từng dòng của file map (bỏ ký tự xuống dòng), không nạp cả file vào bộ nhớ
+    with open(path, "rb") as f:
+        if not use_mmap:
+            for line in f:
+                yield line.rstrip(b"\r\n")
+            return
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for line in iter(mm.readline, b""):
+                yield line.rstrip(b"\r\n")
+
+
 # 2) MAP MẪU "TRƯỜNG HỌC"
 
 def preset_school_map() -> List[str]:
@@ -72,6 +109,11 @@ class GridMap:
     - '.' : ô trống (đi được)
     - 'S' : Start
     - 'G' : Goal
+
+    Lưu trữ gọn: 1 bytearray (mỗi ô 1 byte ký tự) có thêm 1 lớp viền tường bao quanh.
+    - Ô (r, c) ứng với chỉ số phẳng (r + 1) * stride + (c + 1), stride = cols + 2
+    - offsets: độ lệch chỉ số của 4 hàng xóm, tính 1 lần; nhờ viền tường, hàng xóm của mọi ô
+      trong map luôn nằm trong mảng nên tìm đường không cần kiểm tra biên
     """
 
     def __init__(self, lines: List[str]):
@@ -85,17 +127,80 @@ class GridMap:
         if any(len(line) != self.cols for line in lines):
             raise ValueError("Map không hợp lệ: các dòng phải có cùng độ dài.")
 
-        self.grid = [list(line) for line in lines]
+        self.stride = self.cols + 2
+        self.cells = bytearray(b"#") * (self.stride * (self.rows + 2))
+        for r, line in enumerate(lines):
+            i = self.index((r, 0))
+            try:
+                self.cells[i:i + self.cols] = line.encode("ascii")
+            except UnicodeEncodeError:
+                raise ValueError(f"Map không hợp lệ: dòng {r} có ký tự lạ.")
+        self._finish_init()
+
+    @classmethod
+    def from_file(cls, path: str, use_mmap: bool = False) -> "GridMap":
+        """
+        Đọc map từ file theo 2 lượt, không giữ cả map dạng List[str]:
+        - Lượt 1: đếm số dòng và độ dài dòng dài nhất
+        - Lượt 2: chuẩn hóa từng dòng (như normalize_map) rồi chép thẳng vào cells
+        - use_mmap: đọc các dòng qua mmap thay vì đọc file thường
+        Bộ nhớ ~1 byte/ô, dùng được cho map hàng trăm triệu ô.
+        """
+        rows = 0
+        cols = 0
+        for line in _iter_map_lines(path, use_mmap):
+            rows += 1
+            cols = max(cols, len(line))
+        if rows == 0 or cols == 0:
+            raise ValueError("Map rỗng.")
+
+        grid_map = cls.__new__(cls)
+        grid_map.rows = rows
+        grid_map.cols = cols
+        grid_map.stride = stride = cols + 2
+        grid_map.cells = cells = bytearray(b"#") * (stride * (rows + 2))
+        i = stride + 1
+        for r, line in enumerate(_iter_map_lines(path, use_mmap)):
+            if r >= rows:
+                break
+            if not line.isascii():
+                raise ValueError(f"Map không hợp lệ: dòng {r} có ký tự lạ.")
+            cells[i:i + cols] = _pad_row(line, cols)
+            i += stride
+        grid_map._finish_init()
+        return grid_map
+
+    def _finish_init(self) -> None:
+        #lên, xuống, trái, phải (cùng thứ tự với neighbors_4)
+        self.offsets = (-self.stride, self.stride, -1, 1)
         self.start = self._find_char("S")
         self.goal = self._find_char("G")
+        #Hàm được gọi sau mỗi lần set_cell đổi nội dung ô: listener(p, ký tự cũ, ký tự mới)
+        self.listeners: List[Callable[[Pos, str, str], None]] = []
+        #Tăng mỗi khi một ô đổi giữa tường và đi được
+        self.version = 0
+
+    @property
+    def grid(self) -> List[List[str]]:
+        #Bản sao dạng list 2 chiều (chỉ để đọc/hiển thị)
+        return [[chr(b) for b in self.cells[self.index((r, 0)):self.index((r, 0)) + self.cols]]
+                for r in range(self.rows)]
+
+    def index(self, p: Pos) -> int:
+        #Chỉ số phẳng của ô p trong cells
+        return (p[0] + 1) * self.stride + p[1] + 1
+
+    def pos(self, i: int) -> Pos:
+        #Tọa độ (row, col) của chỉ số phẳng i
+        r, c = divmod(i, self.stride)
+        return (r - 1, c - 1)
 
     def _find_char(self, ch: str) -> Pos:
         """Tìm tọa độ ký tự ch (S hoặc G) trong map."""
-        for r in range(self.rows):
-            for c in range(self.cols):
-                if self.grid[r][c] == ch:
-                    return (r, c)
-        raise ValueError(f"Không tìm thấy '{ch}' trong map.")
+        i = self.cells.find(ch.encode("ascii"))
+        if i < 0:
+            raise ValueError(f"Không tìm thấy '{ch}' trong map.")
+        return self.pos(i)
 
     def in_bounds(self, p: Pos) -> bool:
         #Ô p có nằm trong map không
@@ -104,28 +209,39 @@ class GridMap:
 
     def passable(self, p: Pos) -> bool:
         #Ô p có đi qua được không 
-        r, c = p
-        return self.grid[r][c] != "#"
+        return self.cells[self.index(p)] != WALL
 
     def get_cell(self, p: Pos) -> str:
         #Lấy ký tự tại ô p
-        r, c = p
-        return self.grid[r][c]
+        return chr(self.cells[self.index(p)])
 
     def set_cell(self, p: Pos, ch: str) -> None:
-        #Gán ký tự ch cho ô p
-        r, c = p
-        self.grid[r][c] = ch
+        #Gán ký tự ch cho ô p rồi báo cho các listener
+        i = self.index(p)
+        old = chr(self.cells[i])
+        if old == ch:
+            return
+        self.cells[i] = ord(ch)
+        if (old == "#") != (ch == "#"):
+            self.version += 1
+        for listener in list(self.listeners):
+            listener(p, old, ch)
+
+    def add_listener(self, listener: Callable[[Pos, str, str], None]) -> None:
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[Pos, str, str], None]) -> None:
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def neighbors_index(self, i: int) -> List[int]:
+        #Hàng xóm 4 hướng đi được của ô có chỉ số phẳng i
+        cells = self.cells
+        return [j for j in (i - self.stride, i + self.stride, i - 1, i + 1) if cells[j] != WALL]
 
     def neighbors_4(self, p: Pos) -> List[Pos]:
         #Lấy hàng xóm 4 hướng (lên/xuống/trái/phải) hợp lệ và đi được
-        r, c = p
-        cand = [(r - 1, c), (r + 1, c), (r, c - 1), (r, c + 1)]
-        out: List[Pos] = []
-        for q in cand:
-            if self.in_bounds(q) and self.passable(q):
-                out.append(q)
-        return out
+        return [self.pos(j) for j in self.neighbors_index(self.index(p))]
 
 
 
@@ -143,86 +259,518 @@ class AStarPathfinder:
     A* tìm đường ngắn nhất:
     - Mỗi bước đi cost = 1
     - Heuristic: Manhattan distance (phù hợp grid 4 hướng)
+    - g/came_from là mảng int theo chỉ số ô (~9 byte/ô kể cả closed) nên bộ nhớ bị chặn theo kích thước map
+    - record_visited=False: không dựng AStarInfo.visited (map rất lớn), chỉ đếm expansions
     """
 
+    def __init__(self, record_visited: bool = True):
+        self.record_visited = record_visited
+        #Số ô đã mở rộng ở lần find_path gần nhất
+        self.expansions = 0
+
+    def _visited(self, grid_map: GridMap, expanded: Optional[List[int]]) -> Set[Pos]:
+        if expanded is None:
+            return set()
+        return {grid_map.pos(i) for i in expanded}
+
     @staticmethod
     def manhattan(a: Pos, b: Pos) -> int:
         #h = |x1-x2| + |y1-y2|
         return abs(a[0] - b[0]) + abs(a[1] - b[1])
 
     def find_path(self, grid_map: GridMap) -> AStarInfo:
-        start = grid_map.start
-        goal = grid_map.goal
-
-        #open_heap: min-heap theo (f, g, pos)
-        open_heap: List[Tuple[int, int, Pos]] = []
-        heapq.heappush(open_heap, (self.manhattan(start, goal), 0, start))
-
-        #came_from: để truy vết đường đi
-        came_from: Dict[Pos, Optional[Pos]] = {start: None}
-
-        #g_score: lưu chi phí tốt nhất từ Start đến mỗi ô
-        g_score: Dict[Pos, int] = {start: 0}
-
-        #visited: tập các ô đã được mở rộng (closed set)
-        visited: Set[Pos] = set()
+        #Chạy trên chỉ số phẳng (int) của GridMap, chỉ đổi sang (row, col) khi trả kết quả
+        cells = grid_map.cells
+        stride = grid_map.stride
+        offsets = grid_map.offsets
+        start = grid_map.index(grid_map.start)
+        goal = grid_map.index(grid_map.goal)
+        goal_r, goal_c = divmod(goal, stride)
+
+        #open_heap: min-heap theo (f, g, chỉ số ô); chỉ số tăng theo (row, col) nên thứ tự hòa như cũ
+        open_heap: List[Tuple[int, int, int]] = []
+        heapq.heappush(open_heap, (self.manhattan(grid_map.start, grid_map.goal), 0, start))
+
+        #came_from: để truy vết đường đi (-1 = không có ô trước)
+        came_from = int_buffer(len(cells))
+
+        #g_score: lưu chi phí tốt nhất từ Start đến mỗi ô (-1 = chưa chạm tới)
+        g_score = int_buffer(len(cells))
+        g_score[start] = 0
+
+        #closed: các ô đã được mở rộng; expanded giữ thứ tự để dựng tập visited (None = không ghi)
+        closed = bytearray(len(cells))
+        expanded: Optional[List[int]] = [] if self.record_visited else None
+        self.expansions = 0
 
         while open_heap:
             f, g, cur = heapq.heappop(open_heap)
 
-            if cur in visited:
+            if closed[cur]:
                 continue
-            visited.add(cur)
+            closed[cur] = 1
+            self.expansions += 1
+            if expanded is not None:
+                expanded.append(cur)
 
             #tới goal -> reconstruct path
             if cur == goal:
                 path = self._reconstruct(came_from, goal)
-                return AStarInfo(path=path, visited=visited)
+                return AStarInfo(path=[grid_map.pos(i) for i in path],
+                                 visited=self._visited(grid_map, expanded))
 
-            #mở rộng hàng xóm
-            for nxt in grid_map.neighbors_4(cur):
-                tentative_g = g_score[cur] + 1
+            #mở rộng hàng xóm (viền tường nên không cần kiểm tra biên)
+            tentative_g = g + 1
+            for d in offsets:
+                nxt = cur + d
+                if cells[nxt] == WALL:
+                    continue
 
                 #nếu tìm được đường rẻ hơn tới nxt thì update
-                if nxt not in g_score or tentative_g < g_score[nxt]:
+                old_g = g_score[nxt]
+                if old_g < 0 or tentative_g < old_g:
                     g_score[nxt] = tentative_g
-                    h = self.manhattan(nxt, goal)
-                    f_new = tentative_g + h
+                    r, c = divmod(nxt, stride)
+                    f_new = tentative_g + abs(r - goal_r) + abs(c - goal_c)
                     heapq.heappush(open_heap, (f_new, tentative_g, nxt))
                     came_from[nxt] = cur
 
         #không có đường
-        return AStarInfo(path=[], visited=visited)
+        return AStarInfo(path=[], visited=self._visited(grid_map, expanded))
 
-    def _reconstruct(self, came_from: Dict[Pos, Optional[Pos]], goal: Pos) -> List[Pos]:
+    def _reconstruct(self, came_from: array, goal: int) -> List[int]:
         #Truy vết từ goal về start qua came_from
-        path: List[Pos] = []
-        cur: Optional[Pos] = goal
-        while cur is not None:
+        path: List[int] = []
+        cur = goal
+        while cur >= 0:
             path.append(cur)
-            cur = came_from.get(cur)
+            cur = came_from[cur]
         path.reverse()
         return path
 
 
+class BidirectionalAStarPathfinder(AStarPathfinder):
+    """
+    A* hai chiều: một frontier từ Start (h = Manhattan tới Goal), một từ Goal (h = Manhattan tới Start).
+    - Mỗi bước mở rộng phía có open nhỏ hơn -> phía bị bao kín sẽ cạn sớm khi không có đường
+    - mu: chi phí đường tốt nhất đã gặp khi hai phía chạm nhau
+    - Dừng khi một open rỗng hoặc f nhỏ nhất của một trong hai open >= mu (heuristic nhất quán -> mu tối ưu)
+    - expansions: số ô đã mở rộng (cả hai phía) ở lần find_path gần nhất
+    """
+
+    def find_path(self, grid_map: GridMap) -> AStarInfo:
+        cells = grid_map.cells
+        stride = grid_map.stride
+        offsets = grid_map.offsets
+        start = grid_map.index(grid_map.start)
+        goal = grid_map.index(grid_map.goal)
+        self.expansions = 0
+        if cells[start] == WALL or cells[goal] == WALL:
+            return AStarInfo(path=[], visited=set())
+
+        h0 = self.manhattan(grid_map.start, grid_map.goal)
+        #Chỉ số 0: phía Start, 1: phía Goal
+        heaps: Tuple[List[Tuple[int, int, int]], ...] = ([(h0, 0, start)], [(h0, 0, goal)])
+        g_scores = (int_buffer(len(cells)), int_buffer(len(cells)))
+        g_scores[0][start] = 0
+        g_scores[1][goal] = 0
+        came_froms = (int_buffer(len(cells)), int_buffer(len(cells)))
+        closeds = (bytearray(len(cells)), bytearray(len(cells)))
+        targets = (divmod(goal, stride), divmod(start, stride))
+        expanded: Optional[List[int]] = [] if self.record_visited else None
+
+        mu = 0 if start == goal else INF
+        meet = start if start == goal else -1
+
+        while True:
+            #bỏ phần tử cũ (đã đóng) ở đỉnh hai heap
+            for side in (0, 1):
+                heap = heaps[side]
+                while heap and closeds[side][heap[0][2]]:
+                    heapq.heappop(heap)
+            if not heaps[0] or not heaps[1]:
+                break
+            if max(heaps[0][0][0], heaps[1][0][0]) >= mu:
+                break
+
+            side = 0 if len(heaps[0]) <= len(heaps[1]) else 1
+            heap = heaps[side]
+            g_score = g_scores[side]
+            other_g = g_scores[1 - side]
+            came_from = came_froms[side]
+            target_r, target_c = targets[side]
+
+            f, g, cur = heapq.heappop(heap)
+            closeds[side][cur] = 1
+            self.expansions += 1
+            if expanded is not None:
+                expanded.append(cur)
+
+            tentative_g = g + 1
+            for d in offsets:
+                nxt = cur + d
+                if cells[nxt] == WALL:
+                    continue
+                old_g = g_score[nxt]
+                if old_g < 0 or tentative_g < old_g:
+                    g_score[nxt] = tentative_g
+                    r, c = divmod(nxt, stride)
+                    heapq.heappush(heap, (tentative_g + abs(r - target_r) + abs(c - target_c), tentative_g, nxt))
+                    came_from[nxt] = cur
+                #hai phía chạm nhau tại nxt -> cập nhật đường tốt nhất
+                og = other_g[nxt]
+                if og >= 0 and g_score[nxt] + og < mu:
+                    mu = g_score[nxt] + og
+                    meet = nxt
+
+        visited = self._visited(grid_map, expanded)
+        if meet < 0:
+            return AStarInfo(path=[], visited=visited)
+
+        #nửa đầu: Start -> meet, nửa sau: meet -> Goal theo came_from của phía Goal
+        path = self._reconstruct(came_froms[0], meet)
+        cur = came_froms[1][meet]
+        while cur >= 0:
+            path.append(cur)
+            cur = came_froms[1][cur]
+        return AStarInfo(path=[grid_map.pos(i) for i in path], visited=visited)
+
+
+class JumpPointPathfinder(AStarPathfinder):
+    """
+    Jump Point Search cho grid 4 hướng (luật JPFNeverMoveDiagonally của pathfinding.js):
+    - Đi thẳng theo một hướng tới khi gặp Goal, gặp ô có hàng xóm bắt buộc (forced neighbor)
+      hoặc (khi đi dọc) có jump point theo chiều ngang -> chỉ đưa các jump point vào open
+    - Chi phí giữa hai jump point = khoảng cách Manhattan (cùng hàng hoặc cùng cột)
+    - AStarInfo.visited: các jump point đã mở rộng; path được nội suy lại đủ từng ô
+    """
+
+    def find_path(self, grid_map: GridMap) -> AStarInfo:
+        cells = grid_map.cells
+        stride = grid_map.stride
+        start = grid_map.index(grid_map.start)
+        goal = grid_map.index(grid_map.goal)
+        goal_r, goal_c = divmod(goal, stride)
+        self.expansions = 0
+        if cells[start] == WALL or cells[goal] == WALL:
+            return AStarInfo(path=[], visited=set())
+
+        open_heap: List[Tuple[int, int, int]] = []
+        heapq.heappush(open_heap, (self.manhattan(grid_map.start, grid_map.goal), 0, start))
+        came_from = int_buffer(len(cells))
+        g_score = int_buffer(len(cells))
+        g_score[start] = 0
+        closed = bytearray(len(cells))
+        expanded: Optional[List[int]] = [] if self.record_visited else None
+
+        while open_heap:
+            f, g, cur = heapq.heappop(open_heap)
+
+            if closed[cur]:
+                continue
+            closed[cur] = 1
+            self.expansions += 1
+            if expanded is not None:
+                expanded.append(cur)
+
+            if cur == goal:
+                jump_points = self._reconstruct(came_from, goal)
+                return AStarInfo(path=[grid_map.pos(i) for i in self._interpolate(jump_points, stride)],
+                                 visited=self._visited(grid_map, expanded))
+
+            for d in self._directions(came_from[cur], cur, grid_map):
+                jp = self._jump(cells, cur + d, d, goal, stride)
+                if jp < 0 or closed[jp]:
+                    continue
+                tentative_g = g + abs(jp - cur) // abs(d)
+                old_g = g_score[jp]
+                if old_g < 0 or tentative_g < old_g:
+                    g_score[jp] = tentative_g
+                    r, c = divmod(jp, stride)
+                    heapq.heappush(open_heap, (tentative_g + abs(r - goal_r) + abs(c - goal_c), tentative_g, jp))
+                    came_from[jp] = cur
+
+        return AStarInfo(path=[], visited=self._visited(grid_map, expanded))
+
+    @staticmethod
+    def _directions(parent: int, cur: int, grid_map: GridMap) -> Tuple[int, ...]:
+        #Cắt tỉa hàng xóm: đi tiếp theo hướng cũ + hai hướng vuông góc (không quay lại)
+        if parent < 0:
+            return grid_map.offsets
+        stride = grid_map.stride
+        if parent // stride == cur // stride:
+            d = 1 if cur > parent else -1
+            return (d, -stride, stride)
+        d = stride if cur > parent else -stride
+        return (d, -1, 1)
+
+    def _jump(self, cells: bytearray, i: int, d: int, goal: int, stride: int) -> int:
+        #Trả về jump point đầu tiên khi đi từ i theo hướng d, -1 nếu đụng tường
+        side = (1, -1) if abs(d) == stride else (stride, -stride)
+        vertical = abs(d) == stride
+        while cells[i] != WALL:
+            if i == goal:
+                return i
+            #hàng xóm bắt buộc: ô bên cạnh đi được nhưng ô bên cạnh của ô trước đó là tường
+            for q in side:
+                if cells[i + q] != WALL and cells[i - d + q] == WALL:
+                    return i
+            if vertical and (self._jump(cells, i + 1, 1, goal, stride) >= 0
+                             or self._jump(cells, i - 1, -1, goal, stride) >= 0):
+                return i
+            i += d
+        return -1
+
+    @staticmethod
+    def _interpolate(jump_points: List[int], stride: int) -> List[int]:
+        #Nối các jump point (cùng hàng/cột) thành đường đi từng ô
+        path = jump_points[:1]
+        for a, b in zip(jump_points, jump_points[1:]):
+            step = stride if abs(b - a) >= stride else 1
+            if b < a:
+                step = -step
+            path.extend(range(a + step, b + step, step))
+        return path
+
+
+
+class PathCache:
+    """
+    Cache LRU kết quả tìm đường, khóa (map.version, start, goal).
+    - Thêm tường ở p: đường đi không qua p vẫn là ngắn nhất -> chỉ bỏ các đường qua p, giữ phần còn lại ở version mới
+    - Bỏ tường: đường có thể ngắn hơn -> xóa hết
+    """
+
+    def __init__(self, grid_map: GridMap, solver=None, maxsize: int = 256):
+        self.map = grid_map
+        self.solver = solver if solver is not None else AStarPathfinder()
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        #khóa -> (kết quả, tập ô trên đường đi)
+        self.entries: "OrderedDict[Tuple[int, Pos, Pos], Tuple[AStarInfo, Set[Pos]]]" = OrderedDict()
+        grid_map.add_listener(self._on_cell_changed)
+
+    def close(self) -> None:
+        self.map.remove_listener(self._on_cell_changed)
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+    def find_path(self) -> AStarInfo:
+        key = (self.map.version, self.map.start, self.map.goal)
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry[0]
+        self.misses += 1
+        result = self.solver.find_path(self.map)
+        self.entries[key] = (result, set(result.path))
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self.entries)}
+
+    def _on_cell_changed(self, p: Pos, old: str, new: str) -> None:
+        if (old == "#") == (new == "#"):
+            return
+        if new != "#":
+            self.entries.clear()
+            return
+        #Thêm tường: đưa các kết quả không đi qua p sang version mới (giữ thứ tự LRU)
+        version = self.map.version
+        self.entries = OrderedDict(
+            ((version, start, goal), entry)
+            for (_, start, goal), entry in self.entries.items()
+            if p not in entry[1]
+        )
+
+
+
+# 5) TÌM LẠI TĂNG DẦN (D* LITE)
+
+class DStarLitePlanner:
+    """
+    D* Lite: tìm ngược từ Goal về Start và giữ lại g/rhs giữa các lần tìm.
+    - Đăng ký listener trên GridMap: mỗi ô đổi tường <-> đi được chỉ cập nhật lại ô đó và 4 hàng xóm,
+      lần find_path sau chỉ sửa lại phần g bị ảnh hưởng thay vì tìm lại từ đầu
+    - Start di chuyển: cộng km (không cần tìm lại từ đầu); Goal di chuyển: khởi tạo lại
+    - AStarInfo.visited: các ô được mở rộng trong lần find_path gần nhất (vùng phải sửa)
+    """
+
+    def __init__(self, grid_map: GridMap):
+        self.map = grid_map
+        self.pending: Set[int] = set()
+        self.expansions = 0
+        self.total_expansions = 0
+        self._reset()
+        grid_map.add_listener(self._on_cell_changed)
+
+    def close(self) -> None:
+        #Ngừng theo dõi map
+        self.map.remove_listener(self._on_cell_changed)
+
+    def _reset(self) -> None:
+        m = self.map
+        self.goal = m.index(m.goal)
+        self.start = m.index(m.start)
+        self.last_start = self.start
+        self.km = 0
+        self.g: Dict[int, float] = {}
+        self.rhs: Dict[int, float] = {self.goal: 0}
+        #open_key[ô]: khóa hiện tại của ô trong hàng đợi; phần tử heap khác khóa này là cũ, bỏ qua
+        self.open_heap: List[Tuple[float, float, int]] = []
+        self.open_key: Dict[int, Tuple[float, float]] = {}
+        self.pending.clear()
+        self._push(self.goal)
+
+    def _h(self, a: int, b: int) -> int:
+        ar, ac = divmod(a, self.map.stride)
+        br, bc = divmod(b, self.map.stride)
+        return abs(ar - br) + abs(ac - bc)
+
+    def _key(self, s: int) -> Tuple[float, float]:
+        best = min(self.g.get(s, INF), self.rhs.get(s, INF))
+        return (best + self._h(self.start, s) + self.km, best)
+
+    def _push(self, s: int) -> None:
+        key = self._key(s)
+        self.open_key[s] = key
+        heapq.heappush(self.open_heap, (key[0], key[1], s))
+
+    def _top_key(self) -> Tuple[float, float]:
+        #Bỏ các phần tử cũ ở đỉnh heap
+        heap = self.open_heap
+        while heap:
+            k1, k2, s = heap[0]
+            if self.open_key.get(s) == (k1, k2):
+                return (k1, k2)
+            heapq.heappop(heap)
+        return (INF, INF)
+
+    def _update_vertex(self, u: int) -> None:
+        cells = self.map.cells
+        if u != self.goal:
+            if cells[u] == WALL:
+                self.rhs[u] = INF
+            else:
+                g = self.g
+                self.rhs[u] = min((g.get(u + d, INF) for d in self.map.offsets if cells[u + d] != WALL),
+                                  default=INF) + 1
+        self.open_key.pop(u, None)
+        if self.g.get(u, INF) != self.rhs.get(u, INF):
+            self._push(u)
+
+    def _on_cell_changed(self, p: Pos, old: str, new: str) -> None:
+        #Chỉ quan tâm khi ô đổi giữa tường và đi được; xử lý gộp ở lần find_path sau
+        if (old == "#") != (new == "#"):
+            self.pending.add(self.map.index(p))
+
+    def _compute_shortest_path(self) -> List[int]:
+        expanded: List[int] = []
+        cells = self.map.cells
+        offsets = self.map.offsets
+        g = self.g
+        rhs = self.rhs
+        while True:
+            top = self._top_key()
+            start_g = g.get(self.start, INF)
+            start_rhs = rhs.get(self.start, INF)
+            if not (top < self._key(self.start) or start_rhs != start_g):
+                break
+            if top == (INF, INF):
+                break
+            _, _, u = heapq.heappop(self.open_heap)
+            key_new = self._key(u)
+            if top < key_new:
+                #Khóa cũ (km đã tăng) -> đưa lại vào hàng đợi với khóa mới
+                self.open_key[u] = key_new
+                heapq.heappush(self.open_heap, (key_new[0], key_new[1], u))
+                continue
+            del self.open_key[u]
+            expanded.append(u)
+            if g.get(u, INF) > rhs.get(u, INF):
+                g[u] = rhs[u]
+                for d in offsets:
+                    if cells[u + d] != WALL:
+                        self._update_vertex(u + d)
+            else:
+                g[u] = INF
+                self._update_vertex(u)
+                for d in offsets:
+                    if cells[u + d] != WALL:
+                        self._update_vertex(u + d)
+        return expanded
+
+    def find_path(self) -> AStarInfo:
+        m = self.map
+        if m.index(m.goal) != self.goal:
+            self._reset()
+        start = m.index(m.start)
+        if start != self.start:
+            self.start = start
+            self.km += self._h(self.last_start, start)
+            self.last_start = start
+        #Áp dụng các ô đã đổi: chính ô đó và 4 hàng xóm (cạnh nối với ô đó đổi chi phí)
+        for u in self.pending:
+            self._update_vertex(u)
+            for d in m.offsets:
+                if m.cells[u + d] != WALL:
+                    self._update_vertex(u + d)
+        self.pending.clear()
+
+        expanded = self._compute_shortest_path()
+        self.expansions = len(expanded)
+        self.total_expansions += len(expanded)
+        visited = {m.pos(i) for i in expanded}
+
+        #Đi từ Start theo hàng xóm có g nhỏ nhất tới Goal
+        g = self.g
+        cur = self.start
+        if g.get(cur, INF) == INF or m.cells[cur] == WALL:
+            return AStarInfo(path=[], visited=visited)
+        path = [cur]
+        while cur != self.goal:
+            cur = min((cur + d for d in m.offsets if m.cells[cur + d] != WALL),
+                      key=lambda s: g.get(s, INF))
+            path.append(cur)
+        return AStarInfo(path=[m.pos(i) for i in path], visited=visited)
+
+
+
+# 6) GUI
+
+PATHFINDERS = {
+    "astar": AStarPathfinder,
+    "bidir": BidirectionalAStarPathfinder,
+    "jps": JumpPointPathfinder,
+}
 
-# 5) GUI
 
 class SchoolPathfindingGUI:
     """
     Giao diện:
     - Click để đặt/bỏ tường
     - Đặt Start / Goal
-    - Run A* để tìm đường
+    - Run A* để tìm đường (A*/A* 2 chiều/JPS tìm lại từ đầu, D* Lite tìm lại tăng dần sau mỗi lần sửa map)
     - Tô màu trực quan visited/path
     """
 
-    def __init__(self, root: tk.Tk):
+    def __init__(self, root: tk.Tk, map_file: Optional[str] = None, use_mmap: bool = False):
         self.root = root
         self.root.title("Demo Tìm đường trong trường")
 
-        #Load map
-        self.map = GridMap(preset_school_map())
+        #Load map (file nếu có, ngược lại dùng map mẫu)
+        self.map_file = map_file
+        self.use_mmap = use_mmap
+        self.map = self._load_map()
+        #D* Lite giữ trạng thái tìm kiếm qua các lần sửa map
+        self.planner = DStarLitePlanner(self.map)
+        #Cache kết quả A* cho các cặp Start/Goal đã hỏi
+        self.cache = PathCache(self.map)
 
         # ----------- CONTROL PANEL -----------
         ctrl = tk.Frame(root)
@@ -235,6 +783,10 @@ class SchoolPathfindingGUI:
         tk.Radiobutton(ctrl, text="Đặt Start", variable=self.mode, value="start").pack(side=tk.LEFT)
         tk.Radiobutton(ctrl, text="Đặt Goal", variable=self.mode, value="goal").pack(side=tk.LEFT)
 
+        tk.Label(ctrl, text="Thuật toán:").pack(side=tk.LEFT, padx=(10, 2))
+        self.algorithm = tk.StringVar(value="A*")
+        tk.OptionMenu(ctrl, self.algorithm, "A*", "A* 2 chiều", "JPS", "D* Lite").pack(side=tk.LEFT)
+
         tk.Button(ctrl, text="Run A*", command=self.run_astar).pack(side=tk.LEFT, padx=10)
         tk.Button(ctrl, text="Reset map", command=self.reset_map).pack(side=tk.LEFT, padx=5)
 
@@ -260,7 +812,11 @@ class SchoolPathfindingGUI:
 
     def reset_map(self) -> None:
         """Reset map về bản mẫu ban đầu."""
-        self.map = GridMap(preset_school_map())
+        self.planner.close()
+        self.cache.close()
+        self.map = self._load_map()
+        self.planner = DStarLitePlanner(self.map)
+        self.cache = PathCache(self.map)
         self.last_visited = set()
         self.last_path = []
         self.info_label.config(text="Đã reset map. Bấm Run A* để tìm đường.", fg="blue")
@@ -272,6 +828,11 @@ class SchoolPathfindingGUI:
 
         self.draw_grid()
 
+    def _load_map(self) -> GridMap:
+        if self.map_file:
+            return GridMap.from_file(self.map_file, self.use_mmap)
+        return GridMap(preset_school_map())
+
     def on_click(self, event) -> None:
         """Xử lý click: toggle wall hoặc đặt Start/Goal."""
         r = event.y // self.cell
@@ -311,9 +872,16 @@ class SchoolPathfindingGUI:
         self.draw_grid()
 
     def run_astar(self) -> None:
-        """Chạy A* và vẽ kết quả."""
-        solver = AStarPathfinder()
-        result = solver.find_path(self.map)
+        """Chạy thuật toán đang chọn và vẽ kết quả."""
+        algorithm = self.algorithm.get()
+        if algorithm == "D* Lite":
+            result = self.planner.find_path()
+        elif algorithm == "A* 2 chiều":
+            result = BidirectionalAStarPathfinder().find_path(self.map)
+        elif algorithm == "JPS":
+            result = JumpPointPathfinder().find_path(self.map)
+        else:
+            result = self.cache.find_path()
 
         self.last_visited = result.visited
         self.last_path = result.path
@@ -334,6 +902,11 @@ class SchoolPathfindingGUI:
         print("PATH:", result.path)
         print("STEPS:", steps)
         print("VISITED:", len(result.visited))
+        print("CACHE:", self.cache.stats())
+        if algorithm == "D* Lite":
+            #Số ô mở rộng lần này và cộng dồn từ khi nạp map (so với A* tìm lại từ đầu mỗi lần)
+            print("D* LITE:", {"expansions": self.planner.expansions,
+                               "total_expansions": self.planner.total_expansions})
 
         self.draw_grid()
 
@@ -355,7 +928,7 @@ class SchoolPathfindingGUI:
         for r in range(self.map.rows):
             for c in range(self.map.cols):
                 p = (r, c)
-                ch = self.map.grid[r][c]
+                ch = self.map.get_cell(p)
 
                 # màu mặc định
                 fill = "white"
@@ -395,11 +968,45 @@ class SchoolPathfindingGUI:
 
 
 
-# 6) MAIN
+# 7) MAIN
+
+def run_cli(args) -> None:
+    #Tìm đường không cần giao diện (dùng cho map lớn)
+    t0 = time.perf_counter()
+    if args.map_file:
+        grid_map = GridMap.from_file(args.map_file, args.mmap)
+    else:
+        grid_map = GridMap(preset_school_map())
+    t1 = time.perf_counter()
+    #Không dựng tập visited (hàng triệu tuple trên map lớn), chỉ đếm số ô đã mở rộng
+    solver = PATHFINDERS[args.algorithm](record_visited=False)
+    result = solver.find_path(grid_map)
+    t2 = time.perf_counter()
+
+    print(f"MAP: {grid_map.rows}x{grid_map.cols} (đọc {t1 - t0:.3f}s)")
+    if result.path:
+        print("STEPS:", len(result.path) - 1)
+    else:
+        print("Không tìm thấy đường đi!")
+    print("EXPANDED:", solver.expansions)
+    print(f"TIME: {t2 - t1:.3f}s")
+
 
 def main():
+    parser = argparse.ArgumentParser(description="Demo tìm đường trong trường (A*)")
+    parser.add_argument("map_file", nargs="?", help="file map (mỗi dòng 1 hàng; mặc định dùng map mẫu trường học)")
+    parser.add_argument("--mmap", action="store_true", help="đọc file map qua mmap")
+    parser.add_argument("--no-gui", action="store_true", help="chỉ tìm đường và in kết quả, không mở giao diện")
+    parser.add_argument("--algorithm", choices=sorted(PATHFINDERS), default="astar",
+                        help="thuật toán khi chạy --no-gui")
+    args = parser.parse_args()
+
+    if args.no_gui:
+        run_cli(args)
+        return
+
     root = tk.Tk()
-    app = SchoolPathfindingGUI(root)
+    app = SchoolPathfindingGUI(root, args.map_file, args.mmap)
     root.mainloop()
 
 